@@ -0,0 +1,258 @@
+#!/usr/bin/env python3
+"""Functions to write structured JSON logs from a background thread"""
+#
+# Python Script:: bot_logging.py
+#
+# Linter:: pylint
+#
+# Copyright 2021, Matthew Ahrenstein, All Rights Reserved.
+#
+# Maintainers:
+# - Matthew Ahrenstein: matt@ahrenstein.com
+#
+# See LICENSE
+#
+
+import copy
+import datetime
+import json
+import logging
+import logging.handlers
+import queue
+import sys
+import threading
+import time
+
+# Constants that might be useful to adjust for debugging purposes
+LOGGER_NAME = "cryptodip"
+LOG_QUEUE_SIZE = 10000
+SAMPLE_BURST = 5
+SAMPLE_INTERVAL_SECONDS = 60
+STOP_TIMEOUT_SECONDS = 5
+# The fields every record carries on top of the message
+CONTEXT_FIELDS = ("bot", "cycle", "stage", "latency_ms")
+
+# Each bot runs in its own thread so the context is per thread
+CONTEXT = threading.local()
+
+
+def get_logger(module_name: str) -> logging.Logger:
+    """Get the logger of a module, which writes through the bot's log queue
+
+    Args:
+    module_name: The name of the module
+
+    Returns:
+    logger: The logger of the module
+    """
+    return logging.getLogger("%s.%s" % (LOGGER_NAME, module_name))
+
+
+def set_context(bot: str = None, cycle: int = None):
+    """Set the bot name and cycle number added to every record logged by this thread
+
+    Args:
+    bot: The name of the bot
+    cycle: The number of the cycle the bot is running
+    """
+    CONTEXT.bot = bot
+    CONTEXT.cycle = cycle
+    set_stage(None)
+
+
+def set_stage(stage: str):
+    """Set the stage of the cycle this thread is in. Records logged during the stage
+    carry how many milliseconds have passed since it started
+
+    Args:
+    stage: The name of the stage
+    """
+    CONTEXT.stage = stage
+    CONTEXT.stage_started = time.monotonic()
+
+
+def in_context(function):
+    """Wrap a function so records it logs from a worker thread carry the context
+    of the thread that wrapped it, as if the bot had logged them itself
+
+    Args:
+    function: The function to run in a worker thread
+
+    Returns:
+    wrapped: The function, setting the captured context around each call
+    """
+    context = {field: getattr(CONTEXT, field, None)
+               for field in ("bot", "cycle", "stage", "stage_started")}
+
+    def run_in_context(*args, **kwargs):
+        CONTEXT.__dict__.update(context)
+        try:
+            return function(*args, **kwargs)
+        finally:
+            # Workers are reused, so the next task must not inherit this bot's context
+            set_context()
+    return run_in_context
+
+
+class ContextFilter(logging.Filter):
+    """
+    Adds the context of the logging thread to each record
+    """
+    def filter(self, record):
+        record.bot = getattr(CONTEXT, "bot", None)
+        record.cycle = getattr(CONTEXT, "cycle", None)
+        record.stage = getattr(CONTEXT, "stage", None)
+        if record.stage is None:
+            record.latency_ms = None
+        else:
+            record.latency_ms = round((time.monotonic() - CONTEXT.stage_started) * 1000, 1)
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Lets the first few copies of a message through in each interval and drops the rest.
+    The next copy that gets through reports how many were dropped
+    """
+    def __init__(self, burst=SAMPLE_BURST, interval=SAMPLE_INTERVAL_SECONDS):
+        super().__init__()
+        self.burst = burst
+        self.interval = interval
+        # Reentrant so a record logged while another is being filtered can't deadlock
+        self.lock = threading.RLock()
+        # (bot, message template) -> [interval start, records seen, records dropped]
+        self.windows = {}
+
+    def filter(self, record):
+        key = (getattr(record, "bot", None), record.msg)
+        now = time.monotonic()
+        with self.lock:
+            window = self.windows.get(key)
+            if window is None or now - window[0] >= self.interval:
+                window = [now, 0, window[2] if window else 0]
+                self.windows[key] = window
+            window[1] += 1
+            if window[1] > self.burst:
+                window[2] += 1
+                return False
+            record.suppressed = window[2]
+            window[2] = 0
+        return True
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """
+    Puts records on the log queue without ever waiting. When the writer falls behind
+    and the queue is full the record is dropped and counted instead
+    """
+    def __init__(self, log_queue, max_size=LOG_QUEUE_SIZE):
+        super().__init__(log_queue)
+        self.max_size = max_size
+        self.dropped = 0
+
+    def prepare(self, record):
+        # The message and traceback are rendered now since the arguments may change later,
+        # but the traceback is kept out of the message so the writer can put it in its own field
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        if self.queue.qsize() >= self.max_size:
+            self.dropped += 1
+            return
+        record.dropped, self.dropped = self.dropped, 0
+        self.queue.put_nowait(record)
+
+
+class JSONFormatter(logging.Formatter):
+    """
+    Formats each record as a single line of JSON
+    """
+    def format(self, record):
+        entry = {
+            "time": datetime.datetime.utcfromtimestamp(record.created).isoformat() + "Z",
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for field in CONTEXT_FIELDS:
+            value = getattr(record, field, None)
+            if value is not None:
+                entry[field] = value
+        entry.update(getattr(record, "fields", {}))
+        for field in ("suppressed", "dropped"):
+            if getattr(record, field, 0):
+                entry[field] = getattr(record, field)
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class LogListener(logging.handlers.QueueListener):
+    """
+    Writes the queued records from a background thread, like QueueListener,
+    but can give up on a blocked log sink when it is stopped
+    """
+    def stop(self, timeout=None):
+        """Write out the queued records and wait for the background thread to finish.
+        QueueListener.stop always waits forever, which would hang shutdown on a blocked sink
+
+        Args:
+        timeout: The seconds to wait before abandoning the rest, or None to wait forever
+        """
+        if self._thread is None:
+            return
+        self.enqueue_sentinel()
+        self._thread.join(timeout)
+        self._thread = None
+
+
+def start_logging(stream=None, level=logging.INFO) -> LogListener:
+    """Send every bot log record through a queue to a background thread that writes
+    them as JSON lines, so a slow log sink never holds up a cycle
+
+    Args:
+    stream: The stream to write to (Default: stdout)
+    level: The lowest level to log
+
+    Returns:
+    listener: The background writer, which must be passed to stop_logging
+    """
+    # SimpleQueue.put never blocks and is reentrant
+    log_queue = queue.SimpleQueue()
+    stream_handler = logging.StreamHandler(stream or sys.stdout)
+    stream_handler.setFormatter(JSONFormatter())
+    queue_handler = DroppingQueueHandler(log_queue)
+    # Filters run in the logging thread, so they see the bot's context
+    queue_handler.addFilter(ContextFilter())
+    queue_handler.addFilter(SamplingFilter())
+    bot_logger = logging.getLogger(LOGGER_NAME)
+    bot_logger.handlers = [queue_handler]
+    bot_logger.setLevel(level)
+    bot_logger.propagate = False
+    listener = LogListener(log_queue, stream_handler)
+    listener.start()
+    return listener
+
+
+def stop_logging(listener: LogListener):
+    """Write out the queued records and stop the background writer.
+    A blocked log sink gets STOP_TIMEOUT_SECONDS before the rest is abandoned
+
+    Args:
+    listener: The background writer returned by start_logging
+    """
+    logging.getLogger(LOGGER_NAME).handlers = []
+    listener.stop(STOP_TIMEOUT_SECONDS)
+
+
+def silence_logging():
+    """Turn every bot log record off, which is cheaper than writing them nowhere"""
+    logging.getLogger(LOGGER_NAME).setLevel(logging.CRITICAL + 1)
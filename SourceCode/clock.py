@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""Functions to tell the time that can be swapped for a virtual clock"""
+#
+# Python Script:: clock.py
+#
+# Linter:: pylint
+#
+# Copyright 2021, Matthew Ahrenstein, All Rights Reserved.
+#
+# Maintainers:
+# - Matthew Ahrenstein: matt@ahrenstein.com
+#
+# See LICENSE
+#
+
+import datetime
+import time
+
+
+class ClockStopped(Exception):
+    """Raised when a virtual clock is asked to move past its end time"""
+
+
+class SystemClock:
+    """
+    The real clock the bot uses in production
+    """
+    @staticmethod
+    def utcnow() -> datetime.datetime:
+        """Get the current time in UTC"""
+        return datetime.datetime.utcnow()
+
+    @staticmethod
+    def now() -> datetime.datetime:
+        """Get the current local time"""
+        return datetime.datetime.now()
+
+    @staticmethod
+    def sleep(seconds: float):
+        """Wait for the given number of seconds"""
+        time.sleep(seconds)
+
+
+class VirtualClock:
+    """
+    A clock that only moves when something sleeps, so cycles run as fast as the code allows
+    """
+    def __init__(self, start, end=None):
+        self.current = start
+        self.end = end
+
+    def utcnow(self) -> datetime.datetime:
+        """Get the current virtual time"""
+        return self.current
+
+    def now(self) -> datetime.datetime:
+        """Get the current virtual time, which has no time zone"""
+        return self.current
+
+    def sleep(self, seconds: float):
+        """Move the virtual time forward instead of waiting"""
+        self.current += datetime.timedelta(seconds=seconds)
+        if self.end is not None and self.current > self.end:
+            raise ClockStopped("Virtual clock reached %s" % self.end)
+
+
+ACTIVE_CLOCK = SystemClock()
+
+
+def use_clock(new_clock):
+    """Replace the clock every module tells the time with
+
+    Args:
+    new_clock: A SystemClock, VirtualClock, or anything with the same methods
+
+    Returns:
+    previous_clock: The clock that was in use before
+    """
+    global ACTIVE_CLOCK  # pylint: disable=global-statement
+    previous_clock = ACTIVE_CLOCK
+    ACTIVE_CLOCK = new_clock
+    return previous_clock
+
+
+def utcnow() -> datetime.datetime:
+    """Get the current time in UTC from the active clock"""
+    return ACTIVE_CLOCK.utcnow()
+
+
+def now() -> datetime.datetime:
+    """Get the current local time from the active clock"""
+    return ACTIVE_CLOCK.now()
+
+
+def sleep(seconds: float):
+    """Wait on the active clock"""
+    ACTIVE_CLOCK.sleep(seconds)
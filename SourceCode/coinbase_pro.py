@@ -20,6 +20,15 @@ import hmac
 import hashlib
 import requests
 from requests.auth import AuthBase
+import bot_logging
+
+API_URL = "https://api.pro.coinbase.com/"
+SANDBOX_API_URL = "https://api-public.sandbox.pro.coinbase.com/"
+# Market orders settle asynchronously so fills are polled for a few seconds
+FILL_POLL_ATTEMPTS = 5
+FILL_POLL_SECONDS = 0.5
+
+LOGGER = bot_logging.get_logger(__name__)
 
 
 # Create custom authentication for CoinbasePro
@@ -92,12 +101,51 @@ def get_coin_price(api_url: str, config_file: str, currency: str) -> float:
     return coin_price
 
 
-def verify_balance(api_url: str, config_file: str, buy_amount: float) -> bool:
+def get_ticker_price(api_url: str, currency: str, timeout: float = None) -> float:
+    """
+    Get the USD price of a coin from the public Coinbase Pro ticker without credentials
+
+    Args:
+        api_url: The API URL for Coinbase Pro
+        currency: The cryptocurrency the bot is monitoring
+        timeout: The number of seconds to wait for a response
+
+    Returns:
+        coin_price: The price the coin currently holds in USD
+    """
+    api_query = "products/%s-USD/ticker" % currency
+    result = requests.get(api_url + api_query, timeout=timeout)
+    coin_price = float(result.json()['price'])
+    return coin_price
+
+
+def get_ask_price(api_url: str, currency: str, timeout: float = None) -> float:
+    """
+    Get the lowest ask for a coin from the public Coinbase Pro ticker,
+    which is the price a market buy would currently execute at
+
+    Args:
+        api_url: The API URL for Coinbase Pro
+        currency: The cryptocurrency the bot is monitoring
+        timeout: The number of seconds to wait for a response
+
+    Returns:
+        ask_price: The lowest ask in USD
+    """
+    api_query = "products/%s-USD/ticker" % currency
+    result = requests.get(api_url + api_query, timeout=timeout)
+    ask_price = float(result.json()['ask'])
+    return ask_price
+
+
+def verify_balance(api_url: str, config_file: str, buy_amount: float,
+                   timeout: float = None) -> bool:
     """Check if enough money exists in the account
     Args:
         api_url: The API URL for Coinbase Pro
         config_file: Path to the JSON file containing credentials and config options
         buy_amount: The amount of $USD the bot plans to spend
+        timeout: The number of seconds to wait for a response
 
     Returns:
         all_clear: A bool that returns true if there is enough money to transact
@@ -106,21 +154,20 @@ def verify_balance(api_url: str, config_file: str, buy_amount: float) -> bool:
     coinbase_creds = get_cbpro_creds_from_file(config_file)
     coinbase_auth = CoinbaseProAuth(coinbase_creds[0], coinbase_creds[1], coinbase_creds[2])
     api_query = "accounts"
-    result = requests.get(api_url + api_query, auth=coinbase_auth).json()
     try:
+        result = requests.get(api_url + api_query, auth=coinbase_auth, timeout=timeout).json()
         for account in result:
             if account['currency'] == "USD":
                 if float(account['balance']) >= buy_amount:
                     return True
     except Exception as err:
-        print("ERROR: Unable to get current balance!")
-        print(err)
+        LOGGER.error("Unable to get current balance: %s", err)
         return False
     # Return false by default
     return False
 
 
-def buy_currency(api_url: str, config_file: str, currency: str, buy_amount: float) -> bool:
+def place_buy_order(api_url: str, config_file: str, currency: str, buy_amount: float) -> str:
     """
     Conduct a trade on Coinbase Pro to trade a currency with USD
 
@@ -131,7 +178,7 @@ def buy_currency(api_url: str, config_file: str, currency: str, buy_amount: floa
         buy_amount: The amount of $USD the bot plans to spend
 
     Returns:
-        trade_success: A bool that is true if the trade succeeded
+        order_id: The ID of the order or None if the trade failed
     """
     coinbase_creds = get_cbpro_creds_from_file(config_file)
     # Instantiate Coinbase API and query the price
@@ -141,10 +188,57 @@ def buy_currency(api_url: str, config_file: str, currency: str, buy_amount: floa
                                'side': 'buy', 'product_id': '%s-USD' % currency})
     buy_result = requests.post(api_url + buy_query, data=order_config, auth=coinbase_auth).json()
     if 'message' in buy_result:
-        print("LOG: Buy order failed.")
-        print("LOG: Reason: %s" % buy_result['message'])
-        return False
+        LOGGER.error("Buy order failed. Reason: %s", buy_result['message'],
+                    extra={"fields": {"order": buy_result}})
+        return None
     else:
-        print("LOG: Buy order succeeded.")
-        print("LOG: Buy Results: %s" % json.dumps(buy_result, indent=2))
-        return True
+        LOGGER.info("Buy order succeeded.", extra={"fields": {"order": buy_result}})
+        return buy_result['id']
+
+
+def buy_currency(api_url: str, config_file: str, currency: str, buy_amount: float) -> bool:
+    """
+    Conduct a trade on Coinbase Pro to trade a currency with USD
+
+    Args:
+        api_url: The API URL for Coinbase Pro
+        config_file: Path to the JSON file containing credentials and config options
+        currency: The cryptocurrency the bot is monitoring
+        buy_amount: The amount of $USD the bot plans to spend
+
+    Returns:
+        trade_success: A bool that is true if the trade succeeded
+    """
+    return place_buy_order(api_url, config_file, currency, buy_amount) is not None
+
+
+def get_order_fills(api_url: str, config_file: str, order_id: str, currency: str) -> list:
+    """
+    Get the fills of an order, waiting briefly for a market order to settle
+
+    Args:
+        api_url: The API URL for Coinbase Pro
+        config_file: Path to the JSON file containing credentials and config options
+        order_id: The ID of the order
+        currency: The cryptocurrency the bot is monitoring
+
+    Returns:
+        fills: A list of dicts with the fill_id, price, size, and fee of each fill
+    """
+    del currency
+    coinbase_creds = get_cbpro_creds_from_file(config_file)
+    coinbase_auth = CoinbaseProAuth(coinbase_creds[0], coinbase_creds[1], coinbase_creds[2])
+    api_query = "fills?order_id=%s" % order_id
+    for _ in range(FILL_POLL_ATTEMPTS):
+        try:
+            result = requests.get(api_url + api_query, auth=coinbase_auth,
+                                  timeout=FILL_POLL_SECONDS * 10).json()
+            if isinstance(result, list) and result:
+                return [{"fill_id": str(fill['trade_id']), "price": float(fill['price']),
+                         "size": float(fill['size']), "fee": float(fill['fee'])}
+                        for fill in result]
+        except Exception as err:
+            LOGGER.error("Unable to get fills for order %s: %s", order_id, err)
+        time.sleep(FILL_POLL_SECONDS)
+    LOGGER.error("No fills found for order %s", order_id)
+    return []
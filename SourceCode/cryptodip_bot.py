@@ -14,24 +14,82 @@
 #
 
 import argparse
+import os
+import signal
 import bot_internals
+import bot_logging
+import health
+import ledger
+import price_history
+import replay
+import snapshot
 
+LOGGER = bot_logging.get_logger("cryptodip_bot")
 
-def main(config_file: str, debug_mode: bool):
+
+def main(config_files: list, debug_mode: bool, replicated: bool, health_port: int):
     """
     The main function that triggers and runs the bot functions
 
     Args:
-    config_file: Path to the JSON file containing credentials and config options
+    config_files: Paths to the JSON files containing credentials and config options
     debug_mode: Use Sandbox APIs instead of production
+    replicated: Share the bots with other replicas using MongoDB leases
+    health_port: The port to serve health and status on, or 0 to not serve them
+    """
+    # Docker stops containers with SIGTERM so exit cleanly and save the warm state snapshot
+    signal.signal(signal.SIGTERM, bot_internals.handle_shutdown_signal)
+    # Logs are written by a background thread so a slow log driver never holds up a cycle
+    log_listener = bot_logging.start_logging()
+    if health_port:
+        health.start_health_server(health_port)
+    try:
+        if replicated:
+            bot_internals.run_leased_bots(config_files, debug_mode)
+            return
+        # Load the configuration file
+        config_params = bot_internals.read_bot_config(config_files[0])
+        # Start the correct cycle
+        if config_params[6]:
+            bot_internals.gemini_exchange_cycle(config_files[0], debug_mode)
+        else:
+            bot_internals.coinbase_pro_cycle(config_files[0], debug_mode)
+    except bot_internals.ShutdownSignal as err:
+        # Logged once the bot has unwound out of the signal handler
+        LOGGER.info("Received signal %s. Shut down.", err.signum)
+        raise
+    finally:
+        bot_logging.stop_logging(log_listener)
+
+
+def transfer_prices(config_file: str, export_path: str, import_path: str, db_server: str):
+    """
+    Export or import a bot's price history instead of running the bot
+
+    Args:
+    config_file: Path to the JSON file containing credentials and config options
+    export_path: Path of the price history file to write, or None
+    import_path: Path of the price history file to read, or None
+    db_server: The MongoDB server to connect to
     """
-    # Load the configuration file
     config_params = bot_internals.read_bot_config(config_file)
-    # Start the correct cycle
-    if config_params[6]:
-        bot_internals.gemini_exchange_cycle(config_file, debug_mode)
-    else:
-        bot_internals.coinbase_pro_cycle(config_file, debug_mode)
+    if export_path is not None:
+        exported = price_history.export_prices(config_params[8], db_server, export_path)
+        print("LOG: Exported %s prices from %s to %s" % (exported, config_params[8], export_path))
+    if import_path is not None:
+        try:
+            imported = price_history.import_prices(config_params[8], db_server, import_path)
+        except ValueError as err:
+            print("ERROR: Unable to import prices: %s" % err)
+            return
+        print("LOG: Imported %s prices from %s to %s" % (imported, import_path, config_params[8]))
+        # The average has to be rebuilt from the imported history on the next start
+        try:
+            os.remove(snapshot.get_snapshot_path_from_file(config_file, config_params[8]))
+        except FileNotFoundError:
+            pass
+        except OSError as err:
+            print("ERROR: Unable to remove the bot's snapshot: %s" % err)
 
 
 if __name__ == '__main__':
@@ -42,13 +100,65 @@ if __name__ == '__main__':
                     ' cryptocurrency on the dip.')
     # Add arguments
     PARSER.add_argument(
-        '-c', '--configFile', type=str, help="Path to config.json file", required=True
+        '-c', '--configFile', type=str, nargs='+', required=True,
+        help="Path to config.json file, or several when running with --replicated"
     )
     PARSER.add_argument(
         '-d', '--debug', help="Use sandbox APIs", required=False, action='store_true'
     )
+    PARSER.add_argument(
+        '-r', '--replicated', help="Share bots across replicas using MongoDB leases",
+        required=False, action='store_true'
+    )
+    PARSER.add_argument(
+        '-e', '--exportPrices', type=str, required=False,
+        help="Export the bot's price history to this file and exit"
+    )
+    PARSER.add_argument(
+        '-i', '--importPrices', type=str, required=False,
+        help="Import the bot's price history from this file and exit"
+    )
+    PARSER.add_argument(
+        '-m', '--dbServer', type=str, required=False,
+        default=bot_internals.MONGO_DB_CONNECTION,
+        help="MongoDB server to export from, import to, or report on"
+    )
+    PARSER.add_argument(
+        '--report', required=False, action='store_true',
+        help="Print the bot's invested total, cost basis, and unrealized P&L and exit"
+    )
+    PARSER.add_argument(
+        '--healthPort', type=int, required=False,
+        # The Docker HEALTHCHECK reads the same variable, so both agree on the port
+        default=os.environ.get("HEALTH_PORT", health.HEALTH_PORT),
+        help="Port to serve /health and /status on, or 0 to turn them off "
+             "(Default: $HEALTH_PORT or 8080)"
+    )
+    PARSER.add_argument(
+        '--replay', type=str, required=False,
+        help="Replay a price history file through the bot on a virtual clock and exit"
+    )
+    PARSER.add_argument(
+        '--replayBalance', type=float, required=False, default=10000,
+        help="USD balance of each exchange during a replay"
+    )
+    PARSER.add_argument(
+        '--verbose', required=False, action='store_true',
+        help="Show the bot's log during a replay"
+    )
     # Array for all arguments passed to script
     ARGS = PARSER.parse_args()
     ARG_CONFIG = ARGS.configFile
     ARG_DEBUG = ARGS.debug
-    main(ARG_CONFIG, ARG_DEBUG)
+    ARG_REPLICATED = ARGS.replicated
+    if len(ARG_CONFIG) > 1 and not ARG_REPLICATED:
+        PARSER.error("Running more than one config file requires --replicated")
+    if ARGS.replay:
+        replay.run_replay(ARG_CONFIG[0], ARGS.replay, ARGS.replayBalance, ARGS.verbose)
+    elif ARGS.report:
+        ARG_PARAMS = bot_internals.read_bot_config(ARG_CONFIG[0])
+        ledger.print_report(ARG_PARAMS[8], ARGS.dbServer, ARG_PARAMS[0])
+    elif ARGS.exportPrices or ARGS.importPrices:
+        transfer_prices(ARG_CONFIG[0], ARGS.exportPrices, ARGS.importPrices, ARGS.dbServer)
+    else:
+        main(ARG_CONFIG, ARG_DEBUG, ARG_REPLICATED, ARGS.healthPort)
@@ -20,18 +20,27 @@ import time
 import hmac
 import hashlib
 import requests
+import bot_logging
+
+API_URL = "https://api.gemini.com"
+SANDBOX_API_URL = "https://api.sandbox.gemini.com"
+
+LOGGER = bot_logging.get_logger(__name__)
 
 
 # Create custom api call for Gemini
 # as per https://docs.gemini.com/rest-api/#private-api-invocation
 def gemini_api_call(api_url: str, gemini_api_key: str,
-                    gemini_api_secret: str, api_query: str) -> dict:
+                    gemini_api_secret: str, api_query: str,
+                    extra_payload: dict = None, timeout: float = None) -> dict:
     """Make a post to the Gemini Exchange API
     Args:
     api_url: The API URL for the Gemini Exchange
     gemini_api_key: An API key for Gemini Exhcange
     gemini_api_secret: An API secret for Gemini Exhcange
     api_query: The query to be posted to the API
+    extra_payload: Additional fields the API query takes
+    timeout: The number of seconds to wait for a response
 
     Returns:
     api_response: The API response
@@ -46,6 +55,7 @@ def gemini_api_call(api_url: str, gemini_api_key: str,
     payload_nonce = str(posix_timestamp_micros)
 
     payload = {"request": api_query, "nonce": payload_nonce}
+    payload.update(extra_payload or {})
     encoded_payload = json.dumps(payload).encode()
     b64 = base64.b64encode(encoded_payload)
     signature = hmac.new(gemini_api_secret.encode(), b64, hashlib.sha384).hexdigest()
@@ -59,7 +69,7 @@ def gemini_api_call(api_url: str, gemini_api_key: str,
         'Cache-Control': "no-cache"
     }
 
-    response = requests.post(full_query_url, headers=request_headers)
+    response = requests.post(full_query_url, headers=request_headers, timeout=timeout)
     return response.json()
 
 
@@ -79,37 +89,78 @@ def get_gemini_creds_from_file(config_file: str) -> [str, str]:
     return gemini_api_key, gemini_api_secret
 
 
-def get_coin_price(api_url: str, currency: str) -> float:
+def get_coin_price(api_url: str, currency: str, timeout: float = None) -> float:
     """
     Get the USD price of a coin from Gemini
 
     Args:
     api_url: The API URL for Gemini
     currency: The cryptocurrency the bot is monitoring
+    timeout: The number of seconds to wait for a response
 
     Returns:
     coin_price: The price the coin currently holds in USD
     """
     # Instantiate Gemini and query the price
     coin_price = -1
+    price_feeds = None
     api_query = "/v1/pricefeed"
     try:
-        price_feeds = requests.get(api_url + api_query).json()
+        price_feeds = requests.get(api_url + api_query, timeout=timeout).json()
         for feed in price_feeds:
             if feed.get('pair') == currency + "USD":
                 coin_price = float(feed.get('price'))
     except Exception as err:
-        print("ERROR: Unable to get price due to %s" % err)
-        print("Price feed: %s" % price_feeds)
+        LOGGER.error("Unable to get price due to %s", err,
+                     extra={"fields": {"price_feed": price_feeds}})
+    return coin_price
+
+
+def get_ticker_price(api_url: str, currency: str, timeout: float = None) -> float:
+    """
+    Get the last trade price of a coin from the Gemini public ticker
+
+    Args:
+    api_url: The API URL for Gemini
+    currency: The cryptocurrency the bot is monitoring
+    timeout: The number of seconds to wait for a response
+
+    Returns:
+    coin_price: The price the coin currently holds in USD
+    """
+    api_query = "/v1/pubticker/%s" % (currency + "usd").lower()
+    ticker = requests.get(api_url + api_query, timeout=timeout).json()
+    coin_price = float(ticker['last'])
     return coin_price
 
 
-def verify_balance(api_url: str, config_file: str, buy_amount: float) -> bool:
+def get_ask_price(api_url: str, currency: str, timeout: float = None) -> float:
+    """
+    Get the lowest ask for a coin from the Gemini public ticker,
+    which is the price an immediate-or-cancel buy would currently execute at
+
+    Args:
+    api_url: The API URL for Gemini
+    currency: The cryptocurrency the bot is monitoring
+    timeout: The number of seconds to wait for a response
+
+    Returns:
+    ask_price: The lowest ask in USD
+    """
+    api_query = "/v1/pubticker/%s" % (currency + "usd").lower()
+    ticker = requests.get(api_url + api_query, timeout=timeout).json()
+    ask_price = float(ticker['ask'])
+    return ask_price
+
+
+def verify_balance(api_url: str, config_file: str, buy_amount: float,
+                   timeout: float = None) -> bool:
     """Check if enough money exists in the account
     Args:
     api_url: The API URL for Gemini
     config_file: Path to the JSON file containing credentials and config options
     buy_amount: The amount of $USD the bot plans to spend
+    timeout: The number of seconds to wait for a response
 
     Returns:
     all_clear: A bool that returns true if there is enough money to transact
@@ -118,15 +169,15 @@ def verify_balance(api_url: str, config_file: str, buy_amount: float) -> bool:
     gemini_creds = get_gemini_creds_from_file(config_file)
     api_query = "/v1/balances"
     try:
-        result = gemini_api_call(api_url, gemini_creds[0], gemini_creds[1], api_query)
+        result = gemini_api_call(api_url, gemini_creds[0], gemini_creds[1], api_query,
+                                 timeout=timeout)
         for account in result:
             if account.get('currency') == "USD":
                 balance = float(account.get('amount'))
                 if balance >= buy_amount:
                     return True
     except Exception as err:
-        print("ERROR: Unable to get current balance!")
-        print(err)
+        LOGGER.error("Unable to get current balance: %s", err)
         return False
     # Return false by default
     return False
@@ -149,8 +200,8 @@ def get_decimal_max(api_url: str, currency: str) -> int:
     return int(tick_size)
 
 
-def buy_currency(api_url: str, config_file: str,
-                 currency: str, buy_amount: float) -> bool:
+def place_buy_order(api_url: str, config_file: str,
+                    currency: str, buy_amount: float) -> str:
     """Conduct a trade on Gemini to trade a currency with USD
     Args:
     api_url: The API URL for the Gemini Exchange
@@ -159,7 +210,7 @@ def buy_currency(api_url: str, config_file: str,
     buy_amount: The amount of $USD the bot plans to spend
 
     Returns:
-    api_response: The API response
+    order_id: The ID of the order or None if the trade failed
     """
     # Gemini's API doesn't support market orders in an effort to protect you from yourself
     # So we just do a limit order at the current price multipled by 1.2
@@ -207,10 +258,46 @@ def buy_currency(api_url: str, config_file: str,
     response = requests.post(full_query_url, data=None, headers=request_headers)
     order_result = response.json()
     if 'executed_amount' in order_result.keys():
-        print("LOG: Buy order succeeded.")
-        print("LOG: Buy Results: %s" % json.dumps(order_result, indent=2))
-        return True
+        LOGGER.info("Buy order succeeded.", extra={"fields": {"order": order_result}})
+        return str(order_result['order_id'])
     else:
-        print("LOG: Buy order failed.")
-        print("LOG: Reason: %s" % json.dumps(order_result, indent=2))
-        return False
+        LOGGER.error("Buy order failed.", extra={"fields": {"order": order_result}})
+        return None
+
+
+def buy_currency(api_url: str, config_file: str,
+                 currency: str, buy_amount: float) -> bool:
+    """Conduct a trade on Gemini to trade a currency with USD
+    Args:
+    api_url: The API URL for the Gemini Exchange
+    config_file: Path to the JSON file containing credentials and config options
+    currency: The cryptocurrency the bot is monitoring
+    buy_amount: The amount of $USD the bot plans to spend
+
+    Returns:
+    trade_success: A bool that is true if the trade succeeded
+    """
+    return place_buy_order(api_url, config_file, currency, buy_amount) is not None
+
+
+def get_order_fills(api_url: str, config_file: str, order_id: str, currency: str) -> list:
+    """Get the fills of an order from the account's recent trades
+    Args:
+    api_url: The API URL for the Gemini Exchange
+    config_file: Path to the JSON file containing credentials and config options
+    order_id: The ID of the order
+    currency: The cryptocurrency the bot is monitoring
+
+    Returns:
+    fills: A list of dicts with the fill_id, price, size, and fee of each fill
+    """
+    gemini_creds = get_gemini_creds_from_file(config_file)
+    try:
+        trades = gemini_api_call(api_url, gemini_creds[0], gemini_creds[1], "/v1/mytrades",
+                                 {"symbol": (currency + "usd").lower(), "limit_trades": 50})
+        return [{"fill_id": str(trade['tid']), "price": float(trade['price']),
+                 "size": float(trade['amount']), "fee": float(trade['fee_amount'])}
+                for trade in trades if str(trade.get('order_id')) == order_id]
+    except Exception as err:
+        LOGGER.error("Unable to get fills for order %s: %s", order_id, err)
+        return []
@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""Functions to serve the health and status of the bots over HTTP from memory"""
+#
+# Python Script:: health.py
+#
+# Linter:: pylint
+#
+# Copyright 2021, Matthew Ahrenstein, All Rights Reserved.
+#
+# Maintainers:
+# - Matthew Ahrenstein: matt@ahrenstein.com
+#
+# See LICENSE
+#
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import datetime
+import json
+import logging
+import threading
+import time
+import bot_logging
+
+# Constants that might be useful to adjust for debugging purposes
+HEALTH_HOST = "0.0.0.0"
+HEALTH_PORT = 8080
+# A cycle that runs this much longer than expected is reported as stuck
+STUCK_AFTER_SECONDS = 300
+
+LOGGER = bot_logging.get_logger(__name__)
+
+# Bot name -> status fields, written by the bot threads and read by the server
+STATUS = {}
+STATUS_LOCK = threading.Lock()
+
+
+def update_status(bot_name: str, **fields):
+    """Set some of the status fields of a bot
+
+    Args:
+    bot_name: The name of the bot
+    fields: The status fields to set
+    """
+    with STATUS_LOCK:
+        STATUS.setdefault(bot_name, {}).update(fields)
+
+
+def start_cycle(bot_name: str, cycle: int, cycle_time: str, cycle_time_minutes: int):
+    """Record that a bot started a cycle
+
+    Args:
+    bot_name: The name of the bot
+    cycle: The number of the cycle
+    cycle_time: The time the cycle started, as the bot's clock tells it
+    cycle_time_minutes: How long the bot waits between cycles
+    """
+    update_status(bot_name, running=True, cycle=cycle, last_cycle_time=cycle_time,
+                  cycle_time_minutes=cycle_time_minutes, in_cycle=True,
+                  cycle_started=time.monotonic())
+
+
+def finish_cycle(bot_name: str):
+    """Record that a bot finished its cycle and is about to sleep
+
+    Args:
+    bot_name: The name of the bot
+    """
+    finished = time.monotonic()
+    with STATUS_LOCK:
+        status = STATUS.setdefault(bot_name, {})
+        status['in_cycle'] = False
+        status['cycle_finished'] = finished
+        if 'cycle_started' in status:
+            status['last_cycle_duration_seconds'] = round(finished - status['cycle_started'], 3)
+
+
+def get_bot_health(status: dict, now: float) -> [bool, str]:
+    """Check if a bot is making progress
+
+    Args:
+    status: The status fields of the bot
+    now: The current time.monotonic()
+
+    Returns:
+    healthy: A bool that is false if the bot is stuck
+    reason: Why the bot is stuck, or None
+    """
+    if not status.get('running'):
+        return True, None
+    if status.get('in_cycle'):
+        if now - status['cycle_started'] > STUCK_AFTER_SECONDS:
+            return False, "The cycle has run for %.0f seconds" % (now - status['cycle_started'])
+    elif 'cycle_finished' in status:
+        overdue = now - status['cycle_finished'] - status['cycle_time_minutes'] * 60
+        if overdue > STUCK_AFTER_SECONDS:
+            return False, "The next cycle is %.0f seconds overdue" % overdue
+    return True, None
+
+
+def get_status_report() -> dict:
+    """Build the status of every bot from memory
+
+    Returns:
+    report: A dict with the overall health and the status of each bot
+    """
+    now = time.monotonic()
+    with STATUS_LOCK:
+        statuses = {bot_name: dict(status) for bot_name, status in STATUS.items()}
+    report = {"healthy": True, "bots": {}}
+    for bot_name, status in statuses.items():
+        healthy, reason = get_bot_health(status, now)
+        report['healthy'] = report['healthy'] and healthy
+        status['healthy'] = healthy
+        if reason is not None:
+            status['stuck_reason'] = reason
+        # Monotonic times mean nothing outside this process, so report ages instead
+        if 'cycle_started' in status:
+            status['seconds_since_cycle_start'] = round(now - status.pop('cycle_started'), 3)
+        status.pop('cycle_finished', None)
+        report['bots'][bot_name] = status
+    return report
+
+
+class StatusRequestHandler(BaseHTTPRequestHandler):
+    """
+    Answers /health with 200 or 503 and /status with the status of every bot
+    """
+    def do_GET(self):  # pylint: disable=invalid-name
+        """Serve the health or status JSON"""
+        path = self.path.split("?")[0].rstrip("/")
+        if path not in ("", "/health", "/status"):
+            self.send_error(404)
+            return
+        report = get_status_report()
+        if path == "/health":
+            report = {"healthy": report['healthy'],
+                      "bots": {bot_name: {key: status[key] for key in ('healthy', 'cycle')
+                                          if key in status}
+                               for bot_name, status in report['bots'].items()}}
+        body = json.dumps(report, default=str).encode()
+        self.send_response(200 if report['healthy'] else 503)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+        """Keep high frequency polling out of the bot's log"""
+        del format, args
+
+
+class ErrorStatusHandler(logging.Handler):
+    """
+    Keeps the last error each bot logged in its status
+    """
+    def __init__(self):
+        super().__init__(logging.ERROR)
+
+    def emit(self, record):
+        bot_name = getattr(bot_logging.CONTEXT, "bot", None)
+        if bot_name is not None:
+            update_status(bot_name, last_error=record.getMessage(),
+                          last_error_time=datetime.datetime.utcfromtimestamp(record.created))
+
+
+def start_health_server(port: int = HEALTH_PORT, host: str = HEALTH_HOST) -> ThreadingHTTPServer:
+    """Serve /health and /status from a background thread
+
+    Args:
+    port: The TCP port to listen on
+    host: The address to listen on
+
+    Returns:
+    server: The running server or None if it could not be started
+    """
+    logging.getLogger(bot_logging.LOGGER_NAME).addHandler(ErrorStatusHandler())
+    try:
+        server = ThreadingHTTPServer((host, port), StatusRequestHandler)
+    except OSError as err:
+        LOGGER.error("Unable to start the health server on port %s: %s", port, err)
+        return None
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="health-server", daemon=True).start()
+    LOGGER.info("Serving health and status on port %s", port)
+    return server
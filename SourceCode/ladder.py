@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""Functions to buy bigger amounts on deeper dips"""
+#
+# Python Script:: ladder.py
+#
+# Linter:: pylint
+#
+# Copyright 2021, Matthew Ahrenstein, All Rights Reserved.
+#
+# Maintainers:
+# - Matthew Ahrenstein: matt@ahrenstein.com
+#
+# See LICENSE
+#
+
+from bisect import bisect_left
+import datetime
+import json
+
+# The buy-date record used by bots without a ladder, kept so existing cool downs carry over
+LEGACY_TIER_ID = 1
+
+
+def get_tier_id(dip_percentage: float) -> str:
+    """Get the buy-date record ID of a ladder tier. Equal percentages written
+    differently, such as 5 and 5.0, get the same ID so their cool down carries over
+
+    Args:
+    dip_percentage: The dip percentage of the tier
+
+    Returns:
+    tier_id: The buy-date record ID of the tier
+    """
+    dip_percentage = float(dip_percentage)
+    if dip_percentage.is_integer():
+        return "dip-%d" % dip_percentage
+    return "dip-%r" % dip_percentage
+
+
+def read_ladder_config(config_file: str) -> list:
+    """Open a JSON file and get the dip buying tiers out of it.
+    Without a ladder the bot has a single tier made from its dip_percentage and buy_amount
+    Args:
+    config_file: Path to the JSON file containing credentials and config options
+
+    Returns:
+    tiers: A list of (dip_percentage, buy_amount, cool_down_period_days, tier_id) tuples
+    ordered from the deepest dip to the shallowest
+    """
+    with open(config_file) as creds_file:
+        data = json.load(creds_file)
+    cool_down_period_days = data['bot'].get('cool_down_period_days', 7)
+    if 'ladder' not in data['bot']:
+        return [(data['bot']['dip_percentage'], data['bot']['buy_amount'],
+                 cool_down_period_days, LEGACY_TIER_ID)]
+    tiers = []
+    for tier in data['bot']['ladder']:
+        tier_id = get_tier_id(tier['dip_percentage'])
+        # Tiers with the same dip would share one buy-date record and cool down
+        if any(tier_id == existing_tier[3] for existing_tier in tiers):
+            raise ValueError("The ladder has more than one tier with a %s%% dip"
+                             % tier['dip_percentage'])
+        tiers.append((tier['dip_percentage'], tier['buy_amount'],
+                      tier.get('cool_down_period_days', cool_down_period_days), tier_id))
+    # Deeper dips have lower buy prices, so this keeps the thresholds in ascending order
+    tiers.sort(key=lambda tier: tier[0], reverse=True)
+    return tiers
+
+
+def get_thresholds(tiers: list, average_price: float) -> list:
+    """Get the buy price of every tier at the current average price
+
+    Args:
+    tiers: The tiers ordered from the deepest dip to the shallowest
+    average_price: The average price the dips are measured against
+
+    Returns:
+    thresholds: The buy price of each tier in ascending order
+    """
+    return [round(average_price * (1 - tier[0] / 100), 2) for tier in tiers]
+
+
+def get_clear_tiers(tiers: list, buy_dates: dict, now: datetime.datetime) -> list:
+    """Work out once per cycle which tiers are out of their cool down period
+
+    Args:
+    tiers: The tiers ordered from the deepest dip to the shallowest
+    buy_dates: A dict of tier ID to the time of that tier's last buy
+    now: The current time
+
+    Returns:
+    next_clear: For each tier index, the index of the first tier from there on
+    that may buy, or None. It has one extra None entry for the index past the last tier
+    """
+    next_clear = [None] * (len(tiers) + 1)
+    for index in range(len(tiers) - 1, -1, -1):
+        if is_tier_clear(tiers[index], buy_dates, now):
+            next_clear[index] = index
+        else:
+            next_clear[index] = next_clear[index + 1]
+    return next_clear
+
+
+def find_tier(thresholds: list, current_price: float, next_clear: list) -> int:
+    """Find the deepest tier whose dip has been reached and whose cool down has passed
+
+    Args:
+    thresholds: The buy price of each tier in ascending order
+    current_price: The current price of the currency
+    next_clear: The tier lookup from get_clear_tiers
+
+    Returns:
+    tier_index: The index of the tier to buy, or None if no tier can buy
+    """
+    # Every tier from here on has a threshold at or above the current price
+    return next_clear[bisect_left(thresholds, current_price)]
+
+
+def is_tier_clear(tier: tuple, buy_dates: dict, now: datetime.datetime) -> bool:
+    """Check if a tier's cool down period since its last buy has passed
+
+    Args:
+    tier: A (dip_percentage, buy_amount, cool_down_period_days, tier_id) tuple
+    buy_dates: A dict of tier ID to the time of that tier's last buy
+    now: The current time
+
+    Returns:
+    clear_to_buy: A bool that is true if the tier may buy
+    """
+    last_buy_date = buy_dates.get(tier[3])
+    if last_buy_date is None:
+        return False
+    return (now - last_buy_date).days >= tier[2]
+
+
+def get_cool_downs_remaining(tiers: list, buy_dates: dict, now: datetime.datetime) -> dict:
+    """Get how long each tier has left in its cool down period
+
+    Args:
+    tiers: The tiers ordered from the deepest dip to the shallowest
+    buy_dates: A dict of tier ID to the time of that tier's last buy
+    now: The current time
+
+    Returns:
+    cool_downs: A dict of tier ID to the seconds left, or None if the last buy date is unknown
+    """
+    cool_downs = {}
+    for tier in tiers:
+        last_buy_date = buy_dates.get(tier[3])
+        if last_buy_date is None:
+            cool_downs[tier[3]] = None
+        else:
+            cool_down_end = last_buy_date + datetime.timedelta(days=tier[2])
+            cool_downs[tier[3]] = max((cool_down_end - now).total_seconds(), 0)
+    return cool_downs
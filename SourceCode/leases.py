@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""Functions to coordinate bots across replicas with MongoDB leases"""
+#
+# Python Script:: leases.py
+#
+# Linter:: pylint
+#
+# Copyright 2021, Matthew Ahrenstein, All Rights Reserved.
+#
+# Maintainers:
+# - Matthew Ahrenstein: matt@ahrenstein.com
+#
+# See LICENSE
+#
+
+import datetime
+import math
+import os
+import socket
+import time
+import uuid
+import pymongo
+import bot_logging
+import mongo
+
+# Constants that might be useful to adjust for debugging purposes
+LEASE_DB = "cryptodip-leases"
+LEASE_TTL_SECONDS = 60
+HEARTBEAT_SECONDS = 20
+
+LOGGER = bot_logging.get_logger(__name__)
+
+
+def get_node_id() -> str:
+    """Build an identifier that is unique to this replica process
+
+    Returns:
+    node_id: The hostname, process ID, and a random suffix
+    """
+    return "%s-%s-%s" % (socket.gethostname(), os.getpid(), uuid.uuid4().hex[:8])
+
+
+class BotLease:
+    """
+    A lease on a single bot that a replica must hold to run it.
+    Every successful acquisition increments the fencing token
+    """
+    def __init__(self, db_server, bot_name, node_id):
+        self.bot_name = bot_name
+        self.node_id = node_id
+        self.token = 0
+        self.leases = mongo.get_mongo_client(db_server)[LEASE_DB]["leases"]
+        self._valid_until = 0.0
+
+    def acquire(self) -> bool:
+        """Claim the lease if it is free, expired, or already ours
+
+        Returns:
+        acquired: A bool that is true if this replica now holds the lease
+        """
+        sent_at = time.monotonic()
+        now = datetime.datetime.utcnow()
+        try:
+            lease = self.leases.find_one_and_update(
+                {"_id": self.bot_name,
+                 "$or": [{"expires": {"$lt": now}}, {"owner": self.node_id}]},
+                {"$set": {"owner": self.node_id,
+                          "expires": now + datetime.timedelta(seconds=LEASE_TTL_SECONDS)},
+                 "$inc": {"token": 1}},
+                upsert=True, return_document=pymongo.ReturnDocument.AFTER)
+        except pymongo.errors.DuplicateKeyError:
+            # Another replica holds an unexpired lease so the upsert collided with it
+            return False
+        except Exception as err:
+            LOGGER.error("Error acquiring lease for %s: %s", self.bot_name, err)
+            return False
+        self.token = lease['token']
+        self._valid_until = sent_at + LEASE_TTL_SECONDS
+        return True
+
+    def renew(self) -> bool:
+        """Extend the lease as long as nobody has taken it over
+
+        Returns:
+        renewed: A bool that is true if this replica still holds the lease
+        """
+        sent_at = time.monotonic()
+        expires = datetime.datetime.utcnow() + datetime.timedelta(seconds=LEASE_TTL_SECONDS)
+        try:
+            result = self.leases.update_one(
+                {"_id": self.bot_name, "owner": self.node_id, "token": self.token},
+                {"$set": {"expires": expires}})
+        except Exception as err:
+            LOGGER.error("Error renewing lease for %s: %s", self.bot_name, err)
+            return self.is_held()
+        if result.matched_count == 0:
+            self._valid_until = 0.0
+            return False
+        self._valid_until = sent_at + LEASE_TTL_SECONDS
+        return True
+
+    def release(self):
+        """Give the lease up so another replica can take the bot over right away"""
+        self._valid_until = 0.0
+        try:
+            self.leases.update_one(
+                {"_id": self.bot_name, "owner": self.node_id, "token": self.token},
+                {"$set": {"expires": datetime.datetime(1970, 1, 1)}})
+        except Exception as err:
+            LOGGER.error("Error releasing lease for %s: %s", self.bot_name, err)
+
+    def is_held(self) -> bool:
+        """Check the lease locally without a database round trip.
+        The local deadline starts before the renewal was sent so it never outlives the real one
+
+        Returns:
+        held: A bool that is true if the lease has not expired
+        """
+        return time.monotonic() < self._valid_until
+
+
+def heartbeat_node(db_server: str, node_id: str) -> int:
+    """Record that this replica is alive and count the replicas that are
+
+    Args:
+    db_server: The MongoDB server to connect to
+    node_id: The identifier of this replica
+
+    Returns:
+    live_nodes: The number of replicas with an unexpired heartbeat
+    """
+    now = datetime.datetime.utcnow()
+    try:
+        mongo_client = mongo.get_mongo_client(db_server)
+        nodes = mongo_client[LEASE_DB]["nodes"]
+        nodes.update_one({"_id": node_id},
+                         {"$set": {"expires": now + datetime.timedelta(seconds=LEASE_TTL_SECONDS)}},
+                         upsert=True)
+        nodes.delete_many({"expires": {"$lt": now}})
+        live_nodes = nodes.count_documents({})
+    except Exception as err:
+        LOGGER.error("Error recording node heartbeat: %s", err)
+        return 1
+    return max(live_nodes, 1)
+
+
+def remove_node(db_server: str, node_id: str):
+    """Remove this replica's heartbeat so the others rebalance immediately
+
+    Args:
+    db_server: The MongoDB server to connect to
+    node_id: The identifier of this replica
+    """
+    try:
+        mongo_client = mongo.get_mongo_client(db_server)
+        mongo_client[LEASE_DB]["nodes"].delete_one({"_id": node_id})
+    except Exception as err:
+        LOGGER.error("Error removing node heartbeat: %s", err)
+
+
+def fair_share(bot_count: int, live_nodes: int) -> int:
+    """Get the number of bots a single replica should run
+
+    Args:
+    bot_count: The number of bots that are configured
+    live_nodes: The number of replicas with an unexpired heartbeat
+
+    Returns:
+    share: The most bots this replica should hold leases for
+    """
+    return math.ceil(bot_count / live_nodes)
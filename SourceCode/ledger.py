@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""Functions to keep a ledger of every order and fill and report on it"""
+#
+# Python Script:: ledger.py
+#
+# Linter:: pylint
+#
+# Copyright 2021, Matthew Ahrenstein, All Rights Reserved.
+#
+# Maintainers:
+# - Matthew Ahrenstein: matt@ahrenstein.com
+#
+# See LICENSE
+#
+
+import bot_logging
+import mongo
+
+LOGGER = bot_logging.get_logger(__name__)
+
+
+def record_buy(bot_name: str, db_server: str, venue, currency: str,
+               buy_amount: float, order_id: str) -> int:
+    """Record an order and each of its fills in the ledger
+
+    Args:
+    bot_name: The name of the bot
+    db_server: The MongoDB server to connect to
+    venue: The routing.Venue the order was placed on
+    currency: The cryptocurrency the bot is monitoring
+    buy_amount: The amount of $USD the bot spent
+    order_id: The ID of the order or None if the order failed
+
+    Returns:
+    fill_count: The number of new fills that were recorded
+    """
+    # Finish counting fills an earlier failure left out of the totals before adding new ones
+    reconciled = mongo.reconcile_fills(bot_name, db_server)
+    if reconciled:
+        LOGGER.info("Added %s previously uncounted fills to the ledger totals", reconciled)
+    mongo.record_order(bot_name, db_server, {"venue": venue.name, "currency": currency,
+                                             "buy_amount": buy_amount, "order_id": order_id})
+    if order_id is None:
+        return 0
+    fill_count = 0
+    for fill in venue.get_order_fills(order_id, currency):
+        fill = dict(fill, venue=venue.name, order_id=order_id, currency=currency)
+        if mongo.record_fill(bot_name, db_server, fill):
+            fill_count += 1
+    return fill_count
+
+
+def build_report(totals: dict, latest_price: float) -> dict:
+    """Work out the cost basis and profit from the ledger totals
+
+    Args:
+    totals: The ledger totals from mongo.get_ledger_totals
+    latest_price: The price to value the holdings at, or None if it is unknown
+
+    Returns:
+    report: A dict of the totals plus the average cost basis, value, and unrealized P&L
+    """
+    report = dict(totals)
+    report['average_cost'] = totals['invested'] / totals['size'] if totals['size'] else None
+    report['latest_price'] = latest_price
+    if latest_price is None:
+        report['value'] = None
+        report['unrealized_pnl'] = None
+    else:
+        report['value'] = totals['size'] * latest_price
+        report['unrealized_pnl'] = report['value'] - totals['invested']
+    return report
+
+
+def print_report(bot_name: str, db_server: str, currency: str):
+    """Print the ledger report of a bot
+
+    Args:
+    bot_name: The name of the bot
+    db_server: The MongoDB server to connect to
+    currency: The cryptocurrency the bot is monitoring
+    """
+    mongo.reconcile_fills(bot_name, db_server)
+    report = build_report(mongo.get_ledger_totals(bot_name, db_server),
+                          mongo.get_latest_price(bot_name, db_server))
+    print("LOG: %s has %s fills for %s %s" % (bot_name, report['fills'],
+                                              report['size'], currency))
+    print("LOG: Total invested is $%.2f including $%.2f of fees"
+          % (report['invested'], report['fees']))
+    if report['average_cost'] is not None:
+        print("LOG: Average cost basis is $%.2f per %s" % (report['average_cost'], currency))
+    if report['unrealized_pnl'] is not None:
+        print("LOG: Value at $%.2f is $%.2f for an unrealized P&L of $%.2f"
+              % (report['latest_price'], report['value'], report['unrealized_pnl']))
@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+"""An in-memory stand-in for the parts of pymongo the bot uses"""
+#
+# Python Script:: memory_mongo.py
+#
+# Linter:: pylint
+#
+# Copyright 2021, Matthew Ahrenstein, All Rights Reserved.
+#
+# Maintainers:
+# - Matthew Ahrenstein: matt@ahrenstein.com
+#
+# See LICENSE
+#
+
+import copy
+from itertools import count
+import pymongo
+
+COMPARISONS = {
+    "$gt": lambda value, target: value is not None and value > target,
+    "$gte": lambda value, target: value is not None and value >= target,
+    "$lt": lambda value, target: value is not None and value < target,
+    "$lte": lambda value, target: value is not None and value <= target,
+    "$in": lambda value, target: value in target,
+    # Like MongoDB, $ne on an array matches when the array doesn't hold the value
+    "$ne": lambda value, target:
+    target not in value if isinstance(value, list) else value != target,
+}
+
+
+def matches(document: dict, query: dict) -> bool:
+    """Check if a document matches a query
+
+    Args:
+    document: The document to check
+    query: A query using equality, $or, $exists, $in, and comparison operators
+
+    Returns:
+    matched: A bool that is true if the document matches
+    """
+    for key, condition in query.items():
+        if key == "$or":
+            if not any(matches(document, sub_query) for sub_query in condition):
+                return False
+        elif isinstance(condition, dict) and condition and \
+                all(operator.startswith("$") for operator in condition):
+            for operator, target in condition.items():
+                if operator == "$exists":
+                    if (key in document) != bool(target):
+                        return False
+                elif not COMPARISONS[operator](document.get(key), target):
+                    return False
+        elif document.get(key) != condition:
+            return False
+    return True
+
+
+def apply_update(document: dict, update: dict, inserting: bool):
+    """Apply $set, $setOnInsert, $max, $inc, $addToSet, and $pull to a document in place
+
+    Args:
+    document: The document to change
+    update: The update operators
+    inserting: A bool that is true if the document is being created by an upsert
+    """
+    for key, value in update.get("$set", {}).items():
+        document[key] = value
+    if inserting:
+        for key, value in update.get("$setOnInsert", {}).items():
+            document[key] = value
+    for key, value in update.get("$max", {}).items():
+        if key not in document or value > document[key]:
+            document[key] = value
+    for key, value in update.get("$inc", {}).items():
+        document[key] = document.get(key, 0) + value
+    for key, value in update.get("$addToSet", {}).items():
+        if value not in document.setdefault(key, []):
+            document[key].append(value)
+    for key, value in update.get("$pull", {}).items():
+        if key in document:
+            document[key] = [item for item in document[key] if item != value]
+
+
+class UpdateResult:
+    """
+    The counts pymongo reports for an update
+    """
+    def __init__(self, matched_count, upserted_id=None):
+        self.matched_count = matched_count
+        self.upserted_id = upserted_id
+
+
+class Cursor:
+    """
+    The results of a find, which can be sorted and iterated
+    """
+    def __init__(self, documents):
+        self.documents = documents
+
+    def sort(self, key, direction=1):
+        """Order the results by a field"""
+        self.documents.sort(key=lambda document: document.get(key), reverse=direction < 0)
+        return self
+
+    def batch_size(self, size):
+        """Accept a batch size, which makes no difference in memory"""
+        del size
+        return self
+
+    def count(self):
+        """Count the results"""
+        return len(self.documents)
+
+    def __iter__(self):
+        return iter(self.documents)
+
+
+class Collection:
+    """
+    A collection that keeps its documents in a dict keyed by _id, in insertion order
+    """
+    def __init__(self):
+        self.documents = {}
+        self.next_id = count(1)
+
+    def _find(self, query: dict) -> list:
+        """Get the stored documents that match a query"""
+        query = query or {}
+        # Looking a document up by its _id alone is the common case, so skip the scan
+        if set(query) == {"_id"} and not isinstance(query["_id"], dict):
+            document = self.documents.get(query["_id"])
+            return [] if document is None else [document]
+        return [document for document in self.documents.values() if matches(document, query)]
+
+    def insert_one(self, document: dict):
+        """Store a copy of a document"""
+        document = copy.copy(document)
+        document.setdefault("_id", next(self.next_id))
+        if document["_id"] in self.documents:
+            raise pymongo.errors.DuplicateKeyError("Duplicate _id %s" % document["_id"])
+        self.documents[document["_id"]] = document
+
+    def create_index(self, key):
+        """Accept an index, which makes no difference in memory"""
+        del key
+
+    def insert_many(self, documents: list):
+        """Store copies of several documents"""
+        for document in documents:
+            self.insert_one(document)
+
+    def find(self, query: dict = None, projection: dict = None) -> Cursor:
+        """Find copies of the documents that match a query"""
+        del projection
+        return Cursor([copy.copy(document) for document in self._find(query)])
+
+    def find_one(self, query: dict = None, sort: list = None) -> dict:
+        """Find a copy of the first document that matches a query"""
+        cursor = self.find(query)
+        for key, direction in reversed(sort or []):
+            cursor.sort(key, direction)
+        return next(iter(cursor), None)
+
+    def count_documents(self, query: dict) -> int:
+        """Count the documents that match a query"""
+        return len(self._find(query))
+
+    def update_one(self, query: dict, update: dict, upsert: bool = False) -> UpdateResult:
+        """Update the first document that matches a query, creating it if asked to"""
+        found = self._find(query)
+        if found:
+            apply_update(found[0], update, False)
+            return UpdateResult(1)
+        if not upsert:
+            return UpdateResult(0)
+        document = {key: value for key, value in query.items()
+                    if not key.startswith("$") and not isinstance(value, dict)}
+        apply_update(document, update, True)
+        self.insert_one(document)
+        return UpdateResult(0, document["_id"])
+
+    def find_one_and_update(self, query: dict, update: dict, upsert: bool = False,
+                            return_document: bool = False) -> dict:
+        """Update the first document that matches a query and return it"""
+        found = self._find(query)
+        if found:
+            before = copy.copy(found[0])
+            apply_update(found[0], update, False)
+            return copy.copy(found[0]) if return_document else before
+        if not upsert:
+            return None
+        result = self.update_one(query, update, upsert=True)
+        if return_document:
+            return copy.copy(self.documents[result.upserted_id])
+        return None
+
+    def delete_one(self, query: dict):
+        """Remove the first document that matches a query"""
+        found = self._find(query)
+        if found:
+            del self.documents[found[0]["_id"]]
+
+    def delete_many(self, query: dict):
+        """Remove every document that matches a query"""
+        for document in self._find(query):
+            del self.documents[document["_id"]]
+
+
+class Database(dict):
+    """
+    A database whose collections are created on first use
+    """
+    def __missing__(self, name):
+        self[name] = Collection()
+        return self[name]
+
+
+class MongoClient(dict):
+    """
+    A client whose databases are created on first use
+    """
+    def __missing__(self, name):
+        self[name] = Database()
+        return self[name]
@@ -15,11 +15,31 @@
 
 import datetime
 import pymongo
-import bot_internals
+import bot_logging
+import clock
 
 # Constants that might be useful to adjust for debugging purposes
 PURGE_OLDER_THAN_DAYS = 30
 
+# MongoClient keeps a connection pool, so one client is shared per server
+MONGO_CLIENTS = {}
+
+LOGGER = bot_logging.get_logger(__name__)
+
+
+def get_mongo_client(db_server: str):
+    """Get the shared Mongo client for a server, creating it on first use
+
+    Args:
+    db_server: The MongoDB server to connect to
+
+    Returns:
+    mongo_client: A client for the server
+    """
+    if db_server not in MONGO_CLIENTS:
+        MONGO_CLIENTS[db_server] = pymongo.MongoClient(db_server)
+    return MONGO_CLIENTS[db_server]
+
 
 def add_price(bot_name: str, db_server: str, current_price: float):
     """Add a current price record to the database
@@ -29,16 +49,16 @@ def add_price(bot_name: str, db_server: str, current_price: float):
     db_server: The MongoDB server to connect to
     current_price: The current price of the currency
     """
-    timestamp = datetime.datetime.utcnow()
+    timestamp = clock.utcnow()
     try:
         # Create a Mongo client to connect to
-        mongo_client = pymongo.MongoClient(db_server)
+        mongo_client = get_mongo_client(db_server)
         bot_db = mongo_client[bot_name]
         prices_collection = bot_db["prices"]
         record = {"time": timestamp, "price": current_price}
         prices_collection.insert_one(record)
     except Exception as err:
-        print("Error creating price record: %s" % err)
+        LOGGER.error("Error creating price record: %s", err)
 
 
 def read_all_prices(bot_name: str, db_server: str):
@@ -50,118 +70,390 @@ def read_all_prices(bot_name: str, db_server: str):
     """
     try:
         # Create a Mongo client to connect to
-        mongo_client = pymongo.MongoClient(db_server)
+        mongo_client = get_mongo_client(db_server)
         bot_db = mongo_client[bot_name]
         prices_collection = bot_db["prices"]
         records = prices_collection.find()
     except Exception as err:
-        print("Error reading price records: %s" % err)
+        LOGGER.error("Error reading price records: %s", err)
     for record in records:
         print(record)
 
 
-def average_pricing(bot_name: str, db_server: str, average_period: int) -> float:
-    """Check the last week of prices and return the average
-
-        Args:
-        bot_name: The name of the bot
-        db_server: The MongoDB server to connect to
-        average_period: The time period in days to average across
+def cleanup_old_records(bot_name: str, db_server: str):
+    """Remove all price history older than X days
 
-        Returns:
-        average_price: The average price of the last week
-        """
-    price_history = []
+    Args:
+    bot_name: The name of the bot
+    db_server: The MongoDB server to connect to
+    """
     try:
         # Create a Mongo client to connect to
-        mongo_client = pymongo.MongoClient(db_server)
+        mongo_client = get_mongo_client(db_server)
         bot_db = mongo_client[bot_name]
         prices_collection = bot_db["prices"]
-        records = prices_collection.find({})
+        records = prices_collection.find()
     except Exception as err:
-        print("Error reading price records for averaging: %s" % err)
+        LOGGER.error("Error cleaning up old price records: %s", err)
     for record in records:
-        record_age = datetime.datetime.utcnow() - record['time']
-        if record_age.days <= average_period:
-            price_history.append(record['price'])
-    average_price = bot_internals.get_average(price_history)
-    return average_price
+        record_age = clock.utcnow() - record['time']
+        if record_age.days >= PURGE_OLDER_THAN_DAYS:
+            prices_collection.delete_one({"_id": record['_id']})
 
 
-def cleanup_old_records(bot_name: str, db_server: str):
-    """Remove all price history older than X days
+def get_price_window(bot_name: str, db_server: str, average_period: int) -> list:
+    """Get the price records inside the averaging period ordered oldest first
 
     Args:
     bot_name: The name of the bot
     db_server: The MongoDB server to connect to
+    average_period: The time period in days to average across
+
+    Returns:
+    price_window: A list of (time, price) tuples
     """
+    price_window = []
+    # Keep records whose age in whole days is <= average_period, like prune_price_window
+    oldest_time = clock.utcnow() - datetime.timedelta(days=average_period + 1)
     try:
         # Create a Mongo client to connect to
-        mongo_client = pymongo.MongoClient(db_server)
+        mongo_client = get_mongo_client(db_server)
         bot_db = mongo_client[bot_name]
         prices_collection = bot_db["prices"]
-        records = prices_collection.find()
+        records = prices_collection.find({"time": {"$gt": oldest_time}}).sort("time", 1)
+        for record in records:
+            price_window.append((record['time'], record['price']))
     except Exception as err:
-        print("Error cleaning up old price records: %s" % err)
-    for record in records:
-        record_age = datetime.datetime.utcnow() - record['time']
-        if record_age.days >= PURGE_OLDER_THAN_DAYS:
-            prices_collection.delete_one({"_id": record['_id']})
+        LOGGER.error("Error reading price records for the price window: %s", err)
+    return price_window
 
 
-def set_last_buy_date(bot_name: str, db_server: str):
-    """Sets the date the last time the currency was bought
+def get_buy_dates(bot_name: str, db_server: str, tier_ids: list) -> dict:
+    """Get the date of the last buy of every tier in one query
 
     Args:
     bot_name: The name of the bot
     db_server: The MongoDB server to connect to
+    tier_ids: The buy-date record IDs of the bot's tiers
+
+    Returns:
+    buy_dates: A dict of tier ID to the time of its last buy or None if they could not be read
     """
-    timestamp = datetime.datetime.utcnow()
     try:
         # Create a Mongo client to connect to
-        mongo_client = pymongo.MongoClient(db_server)
+        mongo_client = get_mongo_client(db_server)
         bot_db = mongo_client[bot_name]
         buy_date = bot_db["buy-date"]
+        buy_dates = {record['_id']: record['time']
+                     for record in buy_date.find({"_id": {"$in": list(tier_ids)}})}
+        # Create initial records for tiers that don't have one yet
+        timestamp = clock.utcnow()
+        for tier_id in tier_ids:
+            if tier_id not in buy_dates:
+                LOGGER.info("Initializing new last buy date for tier %s", tier_id)
+                buy_date.update_one({"_id": tier_id},
+                                    {"$setOnInsert": {"time": timestamp}}, upsert=True)
+                buy_dates[tier_id] = timestamp
     except Exception as err:
-        print("Error connecting to buy-date collection: %s" % err)
+        LOGGER.error("Error getting buy date records: %s", err)
+        return None
+    return buy_dates
+
+
+def fence_buy_date(bot_name: str, db_server: str, fence_token: int,
+                   tier_ids: list = (1,)) -> bool:
+    """Raise the fencing token on the buy-date records so replicas
+    holding an older lease can no longer reserve a buy
+
+    Args:
+    bot_name: The name of the bot
+    db_server: The MongoDB server to connect to
+    fence_token: The fencing token of the lease that was just acquired
+    tier_ids: The buy-date record IDs of the bot's tiers
+
+    Returns:
+    fenced: A bool that is true if the record now carries the fencing token
+    """
     try:
-        buy_date.find_one_and_update({"_id": 1},
-                                     {"$set": {"time": timestamp}}, upsert=True)
+        # Create a Mongo client to connect to
+        mongo_client = get_mongo_client(db_server)
+        bot_db = mongo_client[bot_name]
+        buy_date = bot_db["buy-date"]
+        timestamp = clock.utcnow()
+        buy_date.bulk_write([pymongo.UpdateOne({"_id": tier_id},
+                                               {"$max": {"fence": fence_token},
+                                                "$setOnInsert": {"time": timestamp}},
+                                               upsert=True)
+                             for tier_id in tier_ids])
     except Exception as err:
-        print("Error updating buy date record: %s" % err)
+        LOGGER.error("Error fencing buy date record: %s", err)
+        return False
+    return True
 
 
-def check_last_buy_date(bot_name: str, db_server: str,
-                        cool_down_period: int) -> bool:
-    """Get the date of the last time the currency was bought
-    and returns true if it >= cool down period
+def reserve_buy_date(bot_name: str, db_server: str, cool_down_period: int,
+                     fence_token: int, tier_id=1) -> datetime.datetime:
+    """Atomically check the cool down period and set the last buy date before buying
+    so that no two replicas can buy inside the same cool down period
 
     Args:
     bot_name: The name of the bot
     db_server: The MongoDB server to connect to
     cool_down_period: The time period in days that you will wait before transacting
+    fence_token: The fencing token of the lease the caller holds,
+    or None when the bot runs standalone without a lease
+    tier_id: The buy-date record ID of the tier that is buying
 
     Returns:
-    clear_to_buy: A bool that is true if we are clear to buy
+    timestamp: The new buy date or None if the buy must not happen
     """
+    timestamp = clock.utcnow()
+    query = {"_id": tier_id,
+             "time": {"$lte": timestamp - datetime.timedelta(days=cool_down_period)}}
+    update = {"time": timestamp}
+    # A standalone bot has no lease to fence, so it leaves any fence from replicated runs alone
+    if fence_token is not None:
+        query["$or"] = [{"fence": {"$exists": False}}, {"fence": {"$lte": fence_token}}]
+        update["fence"] = fence_token
     try:
         # Create a Mongo client to connect to
-        mongo_client = pymongo.MongoClient(db_server)
+        mongo_client = get_mongo_client(db_server)
         bot_db = mongo_client[bot_name]
         buy_date = bot_db["buy-date"]
+        record = buy_date.find_one_and_update(query, {"$set": update})
     except Exception as err:
-        print("Error connecting to buy-date collection: %s" % err)
-    # Create an initial record if the record doesn't exist yet
-    if buy_date.find({'_id': 1}).count() == 0:
-        print("Initializing new last buy date")
-        timestamp = datetime.datetime.utcnow()
-        buy_date.find_one_and_update({"_id": 1},
-                                     {"$set": {"time": timestamp}}, upsert=True)
-        return False
+        LOGGER.error("Error reserving buy date record: %s", err)
+        return None
+    if record is None:
+        return None
+    return timestamp
+
+
+def stream_prices(bot_name: str, db_server: str, batch_size: int):
+    """Read all price records in insertion order, one batch at a time
+
+    Args:
+    bot_name: The name of the bot
+    db_server: The MongoDB server to connect to
+    batch_size: The number of records in each batch
+
+    Yields:
+    batch: A list of (time, price) tuples
+    """
+    # Create a Mongo client to connect to
+    mongo_client = get_mongo_client(db_server)
+    bot_db = mongo_client[bot_name]
+    prices_collection = bot_db["prices"]
+    # ObjectIds grow with insertion time, so sorting on _id needs no extra index
+    records = prices_collection.find({}, {"_id": 0, "time": 1, "price": 1})\
+        .sort("_id", 1).batch_size(batch_size)
+    batch = []
+    for record in records:
+        batch.append((record['time'], record['price']))
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def get_latest_price_time(bot_name: str, db_server: str) -> datetime.datetime:
+    """Get the time of the newest price record
+
+    Args:
+    bot_name: The name of the bot
+    db_server: The MongoDB server to connect to
+
+    Returns:
+    latest_time: The time of the newest price record or None if there are none
+    """
+    # Create a Mongo client to connect to
+    mongo_client = get_mongo_client(db_server)
+    bot_db = mongo_client[bot_name]
+    prices_collection = bot_db["prices"]
+    record = prices_collection.find_one({}, sort=[("time", -1)])
+    if record is None:
+        return None
+    return record['time']
+
+
+def insert_price_batches(bot_name: str, db_server: str, batches) -> int:
+    """Add batches of price records to the database
+
+    Args:
+    bot_name: The name of the bot
+    db_server: The MongoDB server to connect to
+    batches: An iterable of lists of (time, price) tuples
+
+    Returns:
+    inserted: The number of records that were added
+    """
+    inserted = 0
+    # Create a Mongo client to connect to
+    mongo_client = get_mongo_client(db_server)
+    bot_db = mongo_client[bot_name]
+    prices_collection = bot_db["prices"]
+    for batch in batches:
+        if batch:
+            prices_collection.insert_many([{"time": record[0], "price": record[1]}
+                                           for record in batch])
+            inserted += len(batch)
+    return inserted
+
+
+def ensure_indexes(bot_name: str, db_server: str):
+    """Create the indexes the price, order, and fill lookups rely on.
+    Creating an index that already exists does nothing
+
+    Args:
+    bot_name: The name of the bot
+    db_server: The MongoDB server to connect to
+    """
     try:
-        last_buy_date = buy_date.find_one({"_id": 1})['time']
+        # Create a Mongo client to connect to
+        mongo_client = get_mongo_client(db_server)
+        bot_db = mongo_client[bot_name]
+        bot_db["prices"].create_index("time")
+        bot_db["orders"].create_index("time")
+        bot_db["fills"].create_index("order_id")
+        bot_db["fills"].create_index("time")
+        bot_db["fills"].create_index("counted")
     except Exception as err:
-        print("Error getting buy date record: %s" % err)
+        LOGGER.error("Error creating indexes: %s", err)
+
+
+def record_order(bot_name: str, db_server: str, order: dict):
+    """Add an order record to the database, whether or not the order succeeded
+
+    Args:
+    bot_name: The name of the bot
+    db_server: The MongoDB server to connect to
+    order: The venue, currency, buy_amount, and order_id of the order
+    """
+    record = dict(order, time=clock.utcnow())
+    try:
+        # Create a Mongo client to connect to
+        mongo_client = get_mongo_client(db_server)
+        bot_db = mongo_client[bot_name]
+        bot_db["orders"].insert_one(record)
+    except Exception as err:
+        LOGGER.error("Error creating order record: %s", err)
+
+
+def record_fill(bot_name: str, db_server: str, fill: dict) -> bool:
+    """Add a fill record to the database and add it to the ledger totals.
+    A fill that was already counted is skipped so the totals never count it twice
+
+    Args:
+    bot_name: The name of the bot
+    db_server: The MongoDB server to connect to
+    fill: The venue, order_id, fill_id, price, size, and fee of the fill
+
+    Returns:
+    recorded: A bool that is true if the fill was new
+    """
+    record = dict(fill, _id="%s-%s" % (fill['venue'], fill['fill_id']), time=clock.utcnow(),
+                  counted=False)
+    try:
+        # Create a Mongo client to connect to
+        mongo_client = get_mongo_client(db_server)
+        bot_db = mongo_client[bot_name]
+        try:
+            bot_db["fills"].insert_one(record)
+        except pymongo.errors.DuplicateKeyError:
+            record = bot_db["fills"].find_one({"_id": record['_id']})
+            # A fill left uncounted by an earlier failure is finished below
+            if record['counted']:
+                return False
+        count_fill(bot_db, record)
+    except Exception as err:
+        LOGGER.error("Error creating fill record: %s", err)
         return False
-    time_difference = datetime.datetime.utcnow() - last_buy_date
-    return time_difference.days >= cool_down_period
+    return True
+
+
+def count_fill(bot_db, record: dict):
+    """Add a stored fill to the ledger totals, then mark it as counted.
+    The fill's ID is added to the totals in the same update as the $inc and only
+    removed once the fill is marked counted, so finishing a fill whose earlier
+    attempt failed after the $inc does not count it again
+
+    Args:
+    bot_db: The bot's database
+    record: The fill record
+    """
+    try:
+        bot_db["ledger"].update_one(
+            {"_id": "totals", "counting": {"$ne": record['_id']}},
+            {"$inc": {"invested": record['price'] * record['size'] + record['fee'],
+                      "size": record['size'], "fees": record['fee'], "fills": 1},
+             "$addToSet": {"counting": record['_id']}},
+            upsert=True)
+    except pymongo.errors.DuplicateKeyError:
+        # The totals already counted this fill, so the upsert collided with them
+        pass
+    bot_db["fills"].update_one({"_id": record['_id']}, {"$set": {"counted": True}})
+    bot_db["ledger"].update_one({"_id": "totals"}, {"$pull": {"counting": record['_id']}})
+
+
+def reconcile_fills(bot_name: str, db_server: str) -> int:
+    """Count any fills that were stored but never added to the ledger totals.
+    Fills are counted one at a time, so this must run before new fills are recorded
+
+    Args:
+    bot_name: The name of the bot
+    db_server: The MongoDB server to connect to
+
+    Returns:
+    reconciled: The number of fills that were counted
+    """
+    reconciled = 0
+    try:
+        # Create a Mongo client to connect to
+        mongo_client = get_mongo_client(db_server)
+        bot_db = mongo_client[bot_name]
+        for record in bot_db["fills"].find({"counted": False}).sort("time", 1):
+            count_fill(bot_db, record)
+            reconciled += 1
+    except Exception as err:
+        LOGGER.error("Error reconciling fill records: %s", err)
+    return reconciled
+
+
+def get_ledger_totals(bot_name: str, db_server: str) -> dict:
+    """Get the running totals of every recorded fill
+
+    Args:
+    bot_name: The name of the bot
+    db_server: The MongoDB server to connect to
+
+    Returns:
+    totals: A dict of the invested USD, coin size, fees, and number of fills
+    """
+    # Create a Mongo client to connect to
+    mongo_client = get_mongo_client(db_server)
+    bot_db = mongo_client[bot_name]
+    record = bot_db["ledger"].find_one({"_id": "totals"})
+    totals = {"invested": 0.0, "size": 0.0, "fees": 0.0, "fills": 0}
+    if record is not None:
+        totals.update({key: record[key] for key in totals if key in record})
+    return totals
+
+
+def get_latest_price(bot_name: str, db_server: str) -> float:
+    """Get the newest recorded price
+
+    Args:
+    bot_name: The name of the bot
+    db_server: The MongoDB server to connect to
+
+    Returns:
+    latest_price: The newest price or None if there are none
+    """
+    # Create a Mongo client to connect to
+    mongo_client = get_mongo_client(db_server)
+    bot_db = mongo_client[bot_name]
+    record = bot_db["prices"].find_one({}, sort=[("time", -1)])
+    if record is None:
+        return None
+    return record['price']
@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""Functions to export and import a bot's price history as a columnar file"""
+#
+# Python Script:: price_history.py
+#
+# Linter:: pylint
+#
+# Copyright 2021, Matthew Ahrenstein, All Rights Reserved.
+#
+# Maintainers:
+# - Matthew Ahrenstein: matt@ahrenstein.com
+#
+# See LICENSE
+#
+
+from array import array
+import mmap
+import os
+import struct
+import sys
+import zlib
+import mongo
+import snapshot
+
+# Price history file layout (little-endian):
+# file header, bot name padded to 8 bytes, then one block per export batch made of
+# a block header, timestamps (int64 microseconds), and prices (float64)
+HISTORY_MAGIC = b"CDBP"
+HISTORY_VERSION = 1
+FILE_HEADER = struct.Struct("<4sHH")
+BLOCK_HEADER = struct.Struct("<II")
+
+# Constants that might be useful to adjust for debugging purposes
+EXPORT_BATCH_SIZE = 10000
+
+
+def export_prices(bot_name: str, db_server: str, export_path: str) -> int:
+    """Stream the prices collection to a columnar file one batch at a time
+
+    Args:
+    bot_name: The name of the bot
+    db_server: The MongoDB server to connect to
+    export_path: The path of the file to write
+
+    Returns:
+    exported: The number of price records written
+    """
+    exported = 0
+    name = bot_name.encode()
+    padding = b"\0" * (-(FILE_HEADER.size + len(name)) % 8)
+    temp_path = export_path + ".tmp"
+    with open(temp_path, "wb") as export_file:
+        export_file.write(FILE_HEADER.pack(HISTORY_MAGIC, HISTORY_VERSION, len(name))
+                          + name + padding)
+        for batch in mongo.stream_prices(bot_name, db_server, EXPORT_BATCH_SIZE):
+            times = array('q', [snapshot.datetime_to_micros(record[0]) for record in batch])
+            prices = array('d', [record[1] for record in batch])
+            if sys.byteorder == "big":
+                times.byteswap()
+                prices.byteswap()
+            body = times.tobytes() + prices.tobytes()
+            export_file.write(BLOCK_HEADER.pack(len(batch), zlib.crc32(body)) + body)
+            exported += len(batch)
+    os.replace(temp_path, export_path)
+    return exported
+
+
+def scan_price_blocks(mapped, import_path: str):
+    """Walk the blocks of a memory mapped price file, checking each header and checksum
+
+    Args:
+    mapped: The memory mapped file
+    import_path: The path of the file, for error messages
+
+    Yields:
+    offset: The byte offset of the block's timestamps
+    count: The number of records in the block
+    """
+    if len(mapped) < FILE_HEADER.size:
+        raise ValueError("%s is not a price history file" % import_path)
+    magic, version, name_length = FILE_HEADER.unpack_from(mapped)
+    if magic != HISTORY_MAGIC or version != HISTORY_VERSION:
+        raise ValueError("%s is not a price history file" % import_path)
+    offset = FILE_HEADER.size + name_length
+    offset += -offset % 8
+    while offset < len(mapped):
+        if offset + BLOCK_HEADER.size > len(mapped):
+            raise ValueError("%s is truncated" % import_path)
+        count, checksum = BLOCK_HEADER.unpack_from(mapped, offset)
+        offset += BLOCK_HEADER.size
+        if offset + count * 16 > len(mapped):
+            raise ValueError("%s is truncated" % import_path)
+        with memoryview(mapped)[offset:offset + count * 16] as block:
+            if zlib.crc32(block) != checksum:
+                raise ValueError("%s has a corrupt block at byte %s" % (import_path, offset))
+        yield offset, count
+        offset += count * 16
+
+
+def open_price_file(import_path: str) -> mmap.mmap:
+    """Memory map a price file for reading
+
+    Args:
+    import_path: The path of the file to read
+
+    Returns:
+    mapped: The memory mapped file, which must be closed
+    """
+    with open(import_path, "rb") as import_file:
+        # Empty files can't be mapped
+        if os.fstat(import_file.fileno()).st_size < FILE_HEADER.size:
+            raise ValueError("%s is not a price history file" % import_path)
+        return mmap.mmap(import_file.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def verify_price_file(import_path: str) -> int:
+    """Check every block of a price file without decoding it
+
+    Args:
+    import_path: The path of the file to check
+
+    Returns:
+    count: The number of price records in the file
+    """
+    with open_price_file(import_path) as mapped:
+        return sum(count for _, count in scan_price_blocks(mapped, import_path))
+
+
+def read_price_blocks(import_path: str):
+    """Memory map a columnar price file and read it one block at a time
+
+    Args:
+    import_path: The path of the file to read
+
+    Yields:
+    batch: A list of (time, price) tuples
+    """
+    with open_price_file(import_path) as mapped:
+        for offset, count in scan_price_blocks(mapped, import_path):
+            with memoryview(mapped)[offset:offset + count * 16] as block, \
+                    block[:count * 8].cast('q') as times, block[count * 8:].cast('d') as prices:
+                if sys.byteorder == "big":
+                    times = array('q', times)
+                    prices = array('d', prices)
+                    times.byteswap()
+                    prices.byteswap()
+                batch = [(snapshot.micros_to_datetime(times[index]), prices[index])
+                         for index in range(count)]
+            yield batch
+
+
+def import_prices(bot_name: str, db_server: str, import_path: str) -> int:
+    """Load a columnar price file into the prices collection.
+    Records that are not newer than the newest existing price are skipped,
+    so importing the same file twice does not duplicate history
+
+    Args:
+    bot_name: The name of the bot
+    db_server: The MongoDB server to connect to
+    import_path: The path of the file to read
+
+    Returns:
+    imported: The number of price records added
+    """
+    # A bad block halfway through must not leave a half imported history behind
+    verify_price_file(import_path)
+    latest_time = mongo.get_latest_price_time(bot_name, db_server)
+    batches = read_price_blocks(import_path)
+    if latest_time is not None:
+        batches = ([record for record in batch if record[0] > latest_time]
+                   for batch in batches)
+    return mongo.insert_price_batches(bot_name, db_server, batches)
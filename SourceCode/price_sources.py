@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""Functions to get a coin price from several sources at once"""
+#
+# Python Script:: price_sources.py
+#
+# Linter:: pylint
+#
+# Copyright 2021, Matthew Ahrenstein, All Rights Reserved.
+#
+# Maintainers:
+# - Matthew Ahrenstein: matt@ahrenstein.com
+#
+# See LICENSE
+#
+
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+import json
+import math
+import statistics
+import time
+import bot_logging
+import coinbase_pro
+import gemini_exchange
+
+# Each source can have a request and its hedge in flight at once
+REQUESTS_PER_SOURCE = 2
+# Per request timeout so hung requests eventually free their worker
+REQUEST_TIMEOUT_SECONDS = 10
+
+LOGGER = bot_logging.get_logger(__name__)
+
+
+def get_price_source_config_from_file(config_file: str) -> [list, int, float, float, float]:
+    """Open a JSON file and get the price source options out of it
+    Args:
+    config_file: Path to the JSON file containing credentials and config options
+
+    Returns:
+    source_names: The price sources to query, the bot's own exchange by default
+    quorum: How many sources must agree before a price is used (Default: 1)
+    hedge_after_seconds: When to send a duplicate request to slow sources (Default: 0.5)
+    deadline_seconds: When to stop waiting for sources (Default: 3)
+    max_deviation_percent: How far from the median a price may be before it is rejected
+    (Default: 2)
+    """
+    with open(config_file) as creds_file:
+        data = json.load(creds_file)
+    price_config = data.get('price_sources', {})
+    if 'sources' in price_config:
+        source_names = price_config['sources']
+    elif 'gemini' in data:
+        source_names = ["gemini"]
+    else:
+        source_names = ["coinbase"]
+    quorum = price_config.get('quorum', 1)
+    hedge_after_seconds = price_config.get('hedge_after_ms', 500) / 1000
+    deadline_seconds = price_config.get('deadline_ms', 3000) / 1000
+    max_deviation_percent = price_config.get('max_deviation_percent', 2)
+    return source_names, quorum, hedge_after_seconds, deadline_seconds, max_deviation_percent
+
+
+def build_price_sources(source_names: list, currency: str, debug_mode: bool) -> list:
+    """Turn price source names into functions that fetch a price
+
+    Args:
+    source_names: Any of "coinbase", "gemini", and "gemini_ticker"
+    currency: The cryptocurrency the bot is monitoring
+    debug_mode: Use Sandbox APIs instead of production
+
+    Returns:
+    price_sources: A list of (name, function) tuples
+    """
+    if debug_mode:
+        coinbase_pro_api_url = coinbase_pro.SANDBOX_API_URL
+        gemini_exchange_api_url = gemini_exchange.SANDBOX_API_URL
+    else:
+        coinbase_pro_api_url = coinbase_pro.API_URL
+        gemini_exchange_api_url = gemini_exchange.API_URL
+    available_sources = {
+        "coinbase": lambda: coinbase_pro.get_ticker_price(
+            coinbase_pro_api_url, currency, REQUEST_TIMEOUT_SECONDS),
+        "gemini": lambda: gemini_exchange.get_coin_price(
+            gemini_exchange_api_url, currency, REQUEST_TIMEOUT_SECONDS),
+        "gemini_ticker": lambda: gemini_exchange.get_ticker_price(
+            gemini_exchange_api_url, currency, REQUEST_TIMEOUT_SECONDS)
+    }
+    price_sources = []
+    for name in source_names:
+        if name in available_sources:
+            price_sources.append((name, available_sources[name]))
+        else:
+            LOGGER.error("Unknown price source %s will be ignored", name)
+    return price_sources
+
+
+def build_price_executor(price_sources: list, bot_name: str) -> ThreadPoolExecutor:
+    """Create a bot's own pool for querying its price sources, so hung requests of other
+    bots never hold up its hedges. Requests time out within REQUEST_TIMEOUT_SECONDS,
+    long before the next cycle, so the pool never runs short
+
+    Args:
+    price_sources: A list of (name, function) tuples
+    bot_name: The name of the bot, which names the pool's threads
+
+    Returns:
+    price_executor: A pool with a worker for every request and hedge of a cycle
+    """
+    return ThreadPoolExecutor(max_workers=max(len(price_sources), 1) * REQUESTS_PER_SOURCE,
+                              thread_name_prefix="%s-price" % bot_name)
+
+
+def fetch_price(fetch) -> float:
+    """Call a price source and turn any failure into an invalid price
+
+    Args:
+    fetch: A function that returns a price
+
+    Returns:
+    coin_price: The price or -1 if the source failed
+    """
+    try:
+        coin_price = float(fetch())
+    except Exception as err:
+        LOGGER.error("Price source failed: %s", err)
+        return -1
+    if not math.isfinite(coin_price) or coin_price <= 0:
+        return -1
+    return coin_price
+
+
+def get_quorum_price(price_sources: list, price_executor: ThreadPoolExecutor, quorum: int = 1,
+                     hedge_after_seconds: float = 0.5, deadline_seconds: float = 3,
+                     max_deviation_percent: float = 2) -> float:
+    """Query all price sources concurrently, send a duplicate request to any source
+    that has not answered by the hedge time, and agree on a price
+
+    Args:
+    price_sources: A list of (name, function) tuples
+    price_executor: The bot's pool from build_price_executor
+    quorum: How many sources must answer before the median is used
+    hedge_after_seconds: When to send a duplicate request to slow sources
+    deadline_seconds: When to stop waiting for sources
+    max_deviation_percent: How far from the median a price may be before it is rejected
+
+    Returns:
+    coin_price: The agreed price or -1 if no valid price was found
+    """
+    start = time.monotonic()
+    sources = dict(price_sources)
+    fetch_in_context = bot_logging.in_context(fetch_price)
+    pending = {price_executor.submit(fetch_in_context, fetch): name
+               for name, fetch in price_sources}
+    answers = {}
+    hedged = False
+    while pending and len(answers) < min(quorum, len(sources)):
+        if hedged:
+            timeout = start + deadline_seconds - time.monotonic()
+            if timeout <= 0:
+                break
+        else:
+            timeout = max(start + hedge_after_seconds - time.monotonic(), 0)
+        done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+        if not done and not hedged:
+            hedged = True
+            for name in set(pending.values()):
+                LOGGER.info("Price source %s is slow. Sending a hedged request.", name)
+                pending[price_executor.submit(fetch_in_context, sources[name])] = name
+            continue
+        for future in done:
+            name = pending.pop(future)
+            coin_price = future.result()
+            if coin_price != -1 and name not in answers:
+                answers[name] = coin_price
+        # Drop the duplicate requests of sources that have already answered
+        pending = {future: name for future, name in pending.items() if name not in answers}
+    if not answers:
+        return -1
+    if len(answers) < quorum:
+        LOGGER.info("Only %s of %s price sources answered in time.", len(answers), quorum)
+    median_price = statistics.median(answers.values())
+    agreeing_prices = []
+    for name, coin_price in answers.items():
+        if abs(coin_price - median_price) / median_price * 100 > max_deviation_percent:
+            LOGGER.info("Rejecting price %s from %s as an outlier.", coin_price, name)
+        else:
+            agreeing_prices.append(coin_price)
+    if not agreeing_prices:
+        return -1
+    return statistics.median(agreeing_prices)
@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""Functions to replay a recorded price tape through the bot on a virtual clock"""
+#
+# Python Script:: replay.py
+#
+# Linter:: pylint
+#
+# Copyright 2021, Matthew Ahrenstein, All Rights Reserved.
+#
+# Maintainers:
+# - Matthew Ahrenstein: matt@ahrenstein.com
+#
+# See LICENSE
+#
+
+from array import array
+from bisect import bisect_right
+import time
+import bot_internals
+import bot_logging
+import clock
+import ledger
+import memory_mongo
+import mongo
+import price_history
+import routing
+import snapshot
+
+
+class ReplayHarness:
+    """
+    Stands in for the exchanges and price sources during a replay.
+    Every exchange fills at the tape price and has its own USD balance
+    """
+    def __init__(self, tape_times, tape_prices, usd_balance):
+        self.tape_times = tape_times
+        self.tape_prices = tape_prices
+        self.usd_balance = usd_balance
+        self.buys = []
+        self.cycles = 0
+        self.price_sources = [("tape", self.tape_price)]
+
+    def tape_price(self) -> float:
+        """The price source for the bot, which is asked once per cycle"""
+        self.cycles += 1
+        return self.current_price()
+
+    def current_price(self) -> float:
+        """Get the last tape price at or before the virtual time"""
+        index = bisect_right(self.tape_times, snapshot.datetime_to_micros(clock.utcnow()))
+        return self.tape_prices[max(index - 1, 0)]
+
+    def build_venue(self, name: str, config_file: str, debug_mode: bool,
+                    fee_percent: float) -> "ReplayVenue":
+        """Create a stand-in with the same arguments as routing.build_venue"""
+        del config_file, debug_mode
+        return ReplayVenue(name, routing.VENUE_LABELS[name], fee_percent, self)
+
+
+class ReplayVenue:
+    """
+    A stand-in for routing.Venue that fills every buy at the tape price
+    """
+    def __init__(self, name, label, fee_percent, harness):
+        self.name = name
+        self.label = label
+        self.fee_percent = fee_percent
+        self.harness = harness
+        self.usd_balance = harness.usd_balance
+
+    def verify_balance(self, buy_amount: float) -> bool:
+        """Check if enough money is left"""
+        return self.usd_balance >= buy_amount
+
+    def get_ask_price(self, currency: str) -> float:
+        """Get the tape price"""
+        del currency
+        return self.harness.current_price()
+
+    def buy_currency(self, currency: str, buy_amount: float) -> bool:
+        """Record a buy at the tape price"""
+        return self.place_buy_order(currency, buy_amount) is not None
+
+    def place_buy_order(self, currency: str, buy_amount: float) -> str:
+        """Record a buy at the tape price and get its order ID"""
+        if not self.verify_balance(buy_amount):
+            return None
+        ask_price = self.harness.current_price()
+        self.usd_balance -= buy_amount
+        self.harness.buys.append((clock.utcnow(), self.label, currency, ask_price, buy_amount,
+                                  routing.coin_received(buy_amount, ask_price,
+                                                        self.fee_percent)))
+        return "%s-%s" % (self.name, len(self.harness.buys))
+
+    def get_order_fills(self, order_id: str, currency: str) -> list:
+        """Get the single fill of a replayed order, with the fee taken from the USD spent"""
+        del currency
+        buy = self.harness.buys[int(order_id.rsplit("-", 1)[1]) - 1]
+        fee = buy[4] * self.fee_percent / 100
+        return [{"fill_id": order_id, "price": buy[3], "size": buy[5], "fee": fee}]
+
+
+def load_tape(tape_path: str) -> [array, array]:
+    """Read a price tape exported with --exportPrices
+
+    Args:
+    tape_path: The path of the price history file
+
+    Returns:
+    tape_times: The tape timestamps in POSIX microseconds
+    tape_prices: The tape prices
+    """
+    tape_times = array('q')
+    tape_prices = array('d')
+    for batch in price_history.read_price_blocks(tape_path):
+        for record in batch:
+            tape_times.append(snapshot.datetime_to_micros(record[0]))
+            tape_prices.append(record[1])
+    return tape_times, tape_prices
+
+
+def run_replay(config_file: str, tape_path: str, usd_balance: float, verbose: bool):
+    """Run the real bot cycle over a price tape using a virtual clock,
+    an in-memory database, and stand-in exchanges, then print what the bot did
+
+    Args:
+    config_file: Path to the JSON file containing credentials and config options
+    tape_path: The path of the price history file to replay
+    usd_balance: The USD balance each stand-in exchange starts with
+    verbose: Print the bot's own log while replaying
+    """
+    config_params = bot_internals.read_bot_config(config_file)
+    tape_times, tape_prices = load_tape(tape_path)
+    if not tape_times:
+        print("ERROR: %s has no prices to replay" % tape_path)
+        return
+    start = snapshot.micros_to_datetime(tape_times[0])
+    end = snapshot.micros_to_datetime(tape_times[-1])
+    harness = ReplayHarness(tape_times, tape_prices, usd_balance)
+    database = memory_mongo.MongoClient()
+    previous_clock = clock.use_clock(clock.VirtualClock(start, end))
+    previous_client = mongo.MONGO_CLIENTS.get(bot_internals.MONGO_DB_CONNECTION)
+    mongo.MONGO_CLIENTS[bot_internals.MONGO_DB_CONNECTION] = database
+    exchange_name = "gemini" if config_params[6] else "coinbase"
+    if verbose:
+        log_listener = bot_logging.start_logging()
+    else:
+        log_listener = None
+        bot_logging.silence_logging()
+    started_at = time.monotonic()
+    try:
+        try:
+            bot_internals.bot_cycle(config_file, False, exchange_name, replay=harness)
+        except clock.ClockStopped:
+            pass
+        finally:
+            clock.use_clock(previous_clock)
+            # Write out the bot's log before the summary
+            if log_listener is not None:
+                bot_logging.stop_logging(log_listener)
+        elapsed = time.monotonic() - started_at
+        prices = list(database[config_params[8]]["prices"].find().sort("time", 1))
+        print("LOG: Replayed %s cycles from %s to %s in %.2f seconds (%.0f cycles per second)"
+              % (harness.cycles, start, end, elapsed, harness.cycles / max(elapsed, 1e-9)))
+        for buy_time, label, currency, ask_price, buy_amount, coin_amount in harness.buys:
+            print("LOG: %s bought $%s of %s on %s at %s for %s coin"
+                  % (buy_time, buy_amount, currency, label, ask_price, coin_amount))
+        if prices:
+            print("LOG: %s prices are kept in the database, the oldest from %s"
+                  % (len(prices), prices[0]['time']))
+        # The ledger report reads the in-memory database, so it runs before the swap back
+        ledger.print_report(config_params[8], bot_internals.MONGO_DB_CONNECTION,
+                            config_params[0])
+    finally:
+        if previous_client is None:
+            del mongo.MONGO_CLIENTS[bot_internals.MONGO_DB_CONNECTION]
+        else:
+            mongo.MONGO_CLIENTS[bot_internals.MONGO_DB_CONNECTION] = previous_client
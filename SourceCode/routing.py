@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+"""Functions to route dip buys to the exchange that gives the most coin"""
+#
+# Python Script:: routing.py
+#
+# Linter:: pylint
+#
+# Copyright 2021, Matthew Ahrenstein, All Rights Reserved.
+#
+# Maintainers:
+# - Matthew Ahrenstein: matt@ahrenstein.com
+#
+# See LICENSE
+#
+
+from concurrent.futures import ThreadPoolExecutor, wait
+import json
+import bot_logging
+import coinbase_pro
+import gemini_exchange
+import price_sources
+
+# Taker fees in percent used when the config does not override them
+DEFAULT_FEE_PERCENT = {"coinbase": 0.5, "gemini": 0.35}
+VENUE_LABELS = {"coinbase": "Coinbase Pro", "gemini": "Gemini"}
+
+LOGGER = bot_logging.get_logger(__name__)
+
+
+class Venue:
+    """
+    An exchange the bot can buy on. Anything with the same methods,
+    such as a local stand-in for testing, can be used in its place
+    """
+    def __init__(self, name, label, exchange, api_url, config_file, fee_percent):
+        self.name = name
+        self.label = label
+        self.exchange = exchange
+        self.api_url = api_url
+        self.config_file = config_file
+        self.fee_percent = fee_percent
+
+    def verify_balance(self, buy_amount: float) -> bool:
+        """Check if enough money exists in the account"""
+        return self.exchange.verify_balance(self.api_url, self.config_file, buy_amount,
+                                            price_sources.REQUEST_TIMEOUT_SECONDS)
+
+    def get_ask_price(self, currency: str) -> float:
+        """Get the price a buy would currently execute at"""
+        return self.exchange.get_ask_price(self.api_url, currency,
+                                           price_sources.REQUEST_TIMEOUT_SECONDS)
+
+    def buy_currency(self, currency: str, buy_amount: float) -> bool:
+        """Buy the currency with USD"""
+        return self.exchange.buy_currency(self.api_url, self.config_file, currency, buy_amount)
+
+    def place_buy_order(self, currency: str, buy_amount: float) -> str:
+        """Buy the currency with USD and get the order ID, or None if the buy failed"""
+        return self.exchange.place_buy_order(self.api_url, self.config_file, currency, buy_amount)
+
+    def get_order_fills(self, order_id: str, currency: str) -> list:
+        """Get the fill_id, price, size, and fee of each fill of an order"""
+        return self.exchange.get_order_fills(self.api_url, self.config_file, order_id, currency)
+
+
+def build_venue(name: str, config_file: str, debug_mode: bool,
+                fee_percent: float = None) -> Venue:
+    """Create the venue for an exchange
+
+    Args:
+    name: Either "coinbase" or "gemini"
+    config_file: Path to the JSON file containing credentials and config options
+    debug_mode: Use Sandbox APIs instead of production
+    fee_percent: The taker fee of the exchange in percent
+
+    Returns:
+    venue: The venue for the exchange
+    """
+    if fee_percent is None:
+        fee_percent = DEFAULT_FEE_PERCENT[name]
+    if name == "gemini":
+        if debug_mode:
+            api_url = gemini_exchange.SANDBOX_API_URL
+        else:
+            api_url = gemini_exchange.API_URL
+        return Venue(name, VENUE_LABELS[name], gemini_exchange, api_url, config_file, fee_percent)
+    if debug_mode:
+        api_url = coinbase_pro.SANDBOX_API_URL
+    else:
+        api_url = coinbase_pro.API_URL
+    return Venue(name, VENUE_LABELS[name], coinbase_pro, api_url, config_file, fee_percent)
+
+
+def get_routing_config_from_file(config_file: str) -> [bool, float, dict]:
+    """Open a JSON file and get the routing options out of it
+    Args:
+    config_file: Path to the JSON file containing credentials and config options
+
+    Returns:
+    routing_enabled: A bool that is true if the routing section exists
+    deadline_seconds: How long to wait for exchanges to quote (Default: 2)
+    fee_percent: The taker fee in percent of each exchange
+    """
+    with open(config_file) as creds_file:
+        data = json.load(creds_file)
+    routing_enabled = bool('routing' in data)
+    routing_config = data.get('routing', {})
+    deadline_seconds = routing_config.get('deadline_ms', 2000) / 1000
+    fee_percent = dict(DEFAULT_FEE_PERCENT)
+    fee_percent.update(routing_config.get('fee_percent', {}))
+    return routing_enabled, deadline_seconds, fee_percent
+
+
+def coin_received(buy_amount: float, ask_price: float, fee_percent: float) -> float:
+    """Get how much coin a buy would get after fees
+
+    Args:
+    buy_amount: The amount of $USD the bot plans to spend
+    ask_price: The price the buy would execute at
+    fee_percent: The taker fee in percent
+
+    Returns:
+    coin_amount: The amount of coin the buy would get
+    """
+    return buy_amount * (1 - fee_percent / 100) / ask_price
+
+
+def build_quote_executor(venues: list, bot_name: str) -> ThreadPoolExecutor:
+    """Create a bot's own pool for quoting its venues, apart from its price sources,
+    so slow exchange accounts never hold up the bot's price
+
+    Args:
+    venues: The venues the bot may buy on
+    bot_name: The name of the bot, which names the pool's threads
+
+    Returns:
+    quote_executor: A pool with a worker for the ask price and balance check of every venue
+    """
+    return ThreadPoolExecutor(max_workers=len(venues) * 2,
+                              thread_name_prefix="%s-quote" % bot_name)
+
+
+def get_venue_quotes(venues: list, currency: str, buy_amount: float,
+                     deadline_seconds: float, quote_executor: ThreadPoolExecutor) -> dict:
+    """Get the ask price and funding status of every venue concurrently
+
+    Args:
+    venues: The venues to quote
+    currency: The cryptocurrency the bot is monitoring
+    buy_amount: The amount of $USD the bot plans to spend
+    deadline_seconds: How long to wait for the venues to answer
+    quote_executor: The bot's pool from build_quote_executor
+
+    Returns:
+    quotes: A dict of venue name to (ask price, funded) for venues that answered in time
+    """
+    pending_quotes = {}
+    fetch_in_context = bot_logging.in_context(price_sources.fetch_price)
+    for venue in venues:
+        pending_quotes[venue.name] = (
+            quote_executor.submit(fetch_in_context,
+                                  lambda venue=venue: venue.get_ask_price(currency)),
+            quote_executor.submit(bot_logging.in_context(venue.verify_balance), buy_amount))
+    wait([future for pair in pending_quotes.values() for future in pair], timeout=deadline_seconds)
+    quotes = {}
+    for name, (ask_future, balance_future) in pending_quotes.items():
+        if not ask_future.done() or not balance_future.done():
+            LOGGER.info("%s did not quote before the deadline.", name)
+            continue
+        if balance_future.exception() is not None:
+            LOGGER.error("Unable to get the %s balance: %s", name, balance_future.exception())
+            continue
+        quotes[name] = (ask_future.result(), balance_future.result())
+    return quotes
+
+
+def choose_venue(venues: list, quotes: dict, buy_amount: float) -> Venue:
+    """Pick the funded venue where the buy gets the most coin after fees
+
+    Args:
+    venues: The venues that were quoted
+    quotes: A dict of venue name to (ask price, funded)
+    buy_amount: The amount of $USD the bot plans to spend
+
+    Returns:
+    best_venue: The venue to buy on or None if no venue is funded and quoted
+    """
+    best_venue = None
+    best_amount = 0
+    for venue in venues:
+        if venue.name not in quotes:
+            continue
+        ask_price, funded = quotes[venue.name]
+        if ask_price == -1 or not funded:
+            continue
+        amount = coin_received(buy_amount, ask_price, venue.fee_percent)
+        LOGGER.info("%s would fill $%s at %s for %s coin after fees",
+                    venue.label, buy_amount, ask_price, amount)
+        if amount > best_amount:
+            best_venue = venue
+            best_amount = amount
+    return best_venue
+
+
+def select_venue(venues: list, currency: str, buy_amount: float,
+                 deadline_seconds: float, quote_executor: ThreadPoolExecutor) -> Venue:
+    """Pick the venue to send a dip buy to
+
+    Args:
+    venues: The venues the bot may buy on
+    currency: The cryptocurrency the bot is monitoring
+    buy_amount: The amount of $USD the bot plans to spend
+    deadline_seconds: How long to wait for the venues to quote
+    quote_executor: The bot's pool from build_quote_executor
+
+    Returns:
+    buy_venue: The venue to buy on or None if no venue can fill the buy
+    """
+    if len(venues) == 1:
+        if venues[0].verify_balance(buy_amount):
+            return venues[0]
+        return None
+    quotes = get_venue_quotes(venues, currency, buy_amount, deadline_seconds, quote_executor)
+    buy_venue = choose_venue(venues, quotes, buy_amount)
+    if buy_venue is not None:
+        LOGGER.info("Routing the buy to %s", buy_venue.label)
+    return buy_venue
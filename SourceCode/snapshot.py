@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""Functions to save and restore a bot's warm state on local disk"""
+#
+# Python Script:: snapshot.py
+#
+# Linter:: pylint
+#
+# Copyright 2021, Matthew Ahrenstein, All Rights Reserved.
+#
+# Maintainers:
+# - Matthew Ahrenstein: matt@ahrenstein.com
+#
+# See LICENSE
+#
+
+from array import array
+import datetime
+import json
+import math
+import os
+import struct
+import sys
+import zlib
+import bot_logging
+
+# Snapshot file layout (little-endian):
+# header, bot name (utf-8), timestamps (int64 microseconds), prices (float64),
+# and the buy date of each tier as JSON [tier ID, microseconds] pairs
+SNAPSHOT_MAGIC = b"CDBS"
+SNAPSHOT_VERSION = 2
+SNAPSHOT_HEADER = struct.Struct("<4sHHIqII")
+EPOCH = datetime.datetime(1970, 1, 1)
+# Older snapshots are missing too much price history to be worth restoring
+SNAPSHOT_MAX_AGE_SECONDS = 3600
+
+LOGGER = bot_logging.get_logger(__name__)
+
+
+def datetime_to_micros(timestamp: datetime.datetime) -> int:
+    """Convert a naive UTC datetime to POSIX microseconds
+
+    Args:
+    timestamp: A naive UTC datetime like the ones stored in MongoDB
+
+    Returns:
+    micros: The number of microseconds since the POSIX epoch
+    """
+    return (timestamp - EPOCH) // datetime.timedelta(microseconds=1)
+
+
+def micros_to_datetime(micros: int) -> datetime.datetime:
+    """Convert POSIX microseconds to a naive UTC datetime
+
+    Args:
+    micros: The number of microseconds since the POSIX epoch
+
+    Returns:
+    timestamp: A naive UTC datetime
+    """
+    return EPOCH + datetime.timedelta(microseconds=micros)
+
+
+def get_snapshot_path_from_file(config_file: str, bot_name: str) -> str:
+    """Open a JSON file and get the path of the bot's snapshot file
+    Args:
+    config_file: Path to the JSON file containing credentials and config options
+    bot_name: The name of the bot
+
+    Returns:
+    snapshot_path: The path of the snapshot file, stored next to the config by default
+    """
+    with open(config_file) as creds_file:
+        data = json.load(creds_file)
+    if 'snapshot_file' in data['bot']:
+        snapshot_path = data['bot']['snapshot_file']
+    else:
+        snapshot_path = os.path.join(os.path.dirname(os.path.abspath(config_file)),
+                                     "%s.snapshot" % bot_name)
+    return snapshot_path
+
+
+def save_snapshot(snapshot_path: str, bot_name: str, price_window: list, buy_dates: dict):
+    """Write the rolling price window and buy dates to a compact binary file
+
+    Args:
+    snapshot_path: The path of the snapshot file
+    bot_name: The name of the bot
+    price_window: A list of (time, price) tuples ordered oldest first
+    buy_dates: A dict of tier ID to the time of its last buy or None if they are unknown
+    """
+    times = array('q', [datetime_to_micros(record[0]) for record in price_window])
+    prices = array('d', [record[1] for record in price_window])
+    if sys.byteorder == "big":
+        times.byteswap()
+        prices.byteswap()
+    name = bot_name.encode()
+    tiers = json.dumps([[tier_id, datetime_to_micros(buy_date)]
+                        for tier_id, buy_date in (buy_dates or {}).items()]).encode()
+    payload = name + times.tobytes() + prices.tobytes() + tiers
+    header = SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, len(name), len(prices),
+                                  datetime_to_micros(datetime.datetime.utcnow()),
+                                  len(tiers), zlib.crc32(payload))
+    # Write to a temporary file first so a crash mid-write never leaves a torn snapshot
+    temp_path = snapshot_path + ".tmp"
+    try:
+        with open(temp_path, "wb") as snapshot_file:
+            snapshot_file.write(header + payload)
+            snapshot_file.flush()
+            os.fsync(snapshot_file.fileno())
+        os.replace(temp_path, snapshot_path)
+    except OSError as err:
+        LOGGER.error("Unable to save snapshot %s: %s", snapshot_path, err)
+
+
+def load_snapshot(snapshot_path: str, bot_name: str,
+                  newest_price_time: datetime.datetime = None) -> [list, dict]:
+    """Read and validate a snapshot written by save_snapshot
+
+    Args:
+    snapshot_path: The path of the snapshot file
+    bot_name: The name of the bot, which must match the one in the snapshot
+    newest_price_time: The time of the newest price in MongoDB, or None if there are none
+
+    Returns:
+    price_window: A list of (time, price) tuples ordered oldest first or None if invalid
+    buy_dates: A dict of tier ID to the time of its last buy or None if they are unknown
+    """
+    try:
+        with open(snapshot_path, "rb") as snapshot_file:
+            raw = snapshot_file.read()
+    except OSError:
+        return None, None
+    if len(raw) < SNAPSHOT_HEADER.size:
+        LOGGER.info("Snapshot %s is truncated. Ignoring it.", snapshot_path)
+        return None, None
+    magic, version, name_length, count, saved_at, tiers_length, checksum = \
+        SNAPSHOT_HEADER.unpack_from(raw)
+    payload = raw[SNAPSHOT_HEADER.size:]
+    if magic != SNAPSHOT_MAGIC or version != SNAPSHOT_VERSION:
+        LOGGER.info("Snapshot %s has an unknown format. Ignoring it.", snapshot_path)
+        return None, None
+    if len(payload) != name_length + count * 16 + tiers_length or \
+            zlib.crc32(payload) != checksum:
+        LOGGER.info("Snapshot %s is corrupt. Ignoring it.", snapshot_path)
+        return None, None
+    if payload[:name_length].decode(errors="replace") != bot_name:
+        LOGGER.info("Snapshot %s belongs to another bot. Ignoring it.", snapshot_path)
+        return None, None
+    now = datetime_to_micros(datetime.datetime.utcnow())
+    if saved_at > now:
+        LOGGER.info("Snapshot %s was saved in the future. Ignoring it.", snapshot_path)
+        return None, None
+    if now - saved_at > SNAPSHOT_MAX_AGE_SECONDS * 1000000:
+        LOGGER.info("Snapshot %s is too old. Ignoring it.", snapshot_path)
+        return None, None
+    # Prices written after the snapshot, by another replica or an import, are not in it
+    if newest_price_time is not None and datetime_to_micros(newest_price_time) > saved_at:
+        LOGGER.info("Snapshot %s is older than the price history. Ignoring it.", snapshot_path)
+        return None, None
+    times = array('q')
+    prices = array('d')
+    times.frombytes(payload[name_length:name_length + count * 8])
+    prices.frombytes(payload[name_length + count * 8:name_length + count * 16])
+    if sys.byteorder == "big":
+        times.byteswap()
+        prices.byteswap()
+    for index, price in enumerate(prices):
+        if not math.isfinite(price) or price <= 0 or \
+                (index > 0 and times[index] < times[index - 1]):
+            LOGGER.info("Snapshot %s contains invalid prices. Ignoring it.", snapshot_path)
+            return None, None
+    price_window = [(micros_to_datetime(times[index]), prices[index])
+                    for index in range(count)]
+    buy_dates = {tier_id: micros_to_datetime(micros)
+                 for tier_id, micros in json.loads(payload[name_length + count * 16:])}
+    if not buy_dates:
+        buy_dates = None
+    return price_window, buy_dates
@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+"""Shared fixtures that run the bot's modules against an in-memory database and a virtual clock"""
+#
+# Python Script:: conftest.py
+#
+# Linter:: pylint
+#
+# Copyright 2021, Matthew Ahrenstein, All Rights Reserved.
+#
+# Maintainers:
+# - Matthew Ahrenstein: matt@ahrenstein.com
+#
+# See LICENSE
+#
+
+import datetime
+import os
+import sys
+import pytest
+
+# The bot is a flat set of modules that import each other by name
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                "SourceCode"))
+
+import clock  # pylint: disable=wrong-import-position
+import memory_mongo  # pylint: disable=wrong-import-position
+import mongo  # pylint: disable=wrong-import-position
+
+DB_SERVER = "test-db"
+START_TIME = datetime.datetime(2021, 4, 1)
+
+
+@pytest.fixture(name="database")
+def fixture_database():
+    """An in-memory MongoDB that the mongo module uses for DB_SERVER"""
+    database = memory_mongo.MongoClient()
+    mongo.MONGO_CLIENTS[DB_SERVER] = database
+    yield database
+    del mongo.MONGO_CLIENTS[DB_SERVER]
+
+
+@pytest.fixture(name="virtual_clock")
+def fixture_virtual_clock():
+    """A virtual clock starting at START_TIME that only moves when slept on"""
+    virtual_clock = clock.VirtualClock(START_TIME)
+    previous_clock = clock.use_clock(virtual_clock)
+    yield virtual_clock
+    clock.use_clock(previous_clock)
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""Tests for reading the bot configuration"""
+#
+# Python Script:: test_bot_internals.py
+#
+# Linter:: pylint
+#
+# Copyright 2021, Matthew Ahrenstein, All Rights Reserved.
+#
+# Maintainers:
+# - Matthew Ahrenstein: matt@ahrenstein.com
+#
+# See LICENSE
+#
+
+import json
+import os
+import signal
+import pytest
+import bot_internals
+
+
+def read_config(tmp_path, config):
+    """Write a config file and read the bot configuration out of it"""
+    config_file = tmp_path / "config.json"
+    config_file.write_text(json.dumps(config))
+    return bot_internals.read_bot_config(str(config_file))
+
+
+def test_defaults(tmp_path):
+    """Optional settings fall back to their defaults"""
+    config_params = read_config(tmp_path, {"bot": {"currency": "ETH", "buy_amount": 50,
+                                                   "dip_percentage": 10}, "gemini": {}})
+    assert config_params == ("ETH", 50, 10, 7, 7, False, True, 60, "Gemini-ETH-bot")
+
+
+def test_unnamed_coinbase_bot_keeps_its_database(tmp_path):
+    """Unnamed Coinbase Pro bots keep the name their database has always had"""
+    config_params = read_config(tmp_path, {"bot": {"currency": "BTC", "buy_amount": 50,
+                                                   "dip_percentage": 10}, "coinbase": {}})
+    assert not config_params[6]
+    assert config_params[8] == "Gemini-BTC-bot"
+
+
+def test_ladder_replaces_single_tier(tmp_path):
+    """A bot with a ladder needs no buy amount or dip percentage of its own"""
+    config_params = read_config(tmp_path, {"bot": {"currency": "ETH", "ladder": [
+        {"dip_percentage": 10, "buy_amount": 50}]}, "coinbase": {}})
+    assert config_params[:3] == ("ETH", None, None)
+
+
+def test_shutdown_signal_exits_cleanly():
+    """SIGTERM unwinds the bot with a clean exit status that says which signal stopped it"""
+    previous_handler = signal.signal(signal.SIGTERM, bot_internals.handle_shutdown_signal)
+    try:
+        with pytest.raises(SystemExit) as shutdown:
+            os.kill(os.getpid(), signal.SIGTERM)
+    finally:
+        signal.signal(signal.SIGTERM, previous_handler)
+    assert shutdown.value.code == 0
+    assert shutdown.value.signum == signal.SIGTERM
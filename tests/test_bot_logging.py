@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""Tests for the structured logs and their background writer"""
+#
+# Python Script:: test_bot_logging.py
+#
+# Linter:: pylint
+#
+# Copyright 2021, Matthew Ahrenstein, All Rights Reserved.
+#
+# Maintainers:
+# - Matthew Ahrenstein: matt@ahrenstein.com
+#
+# See LICENSE
+#
+
+from concurrent.futures import ThreadPoolExecutor
+import json
+import logging
+import queue
+import sys
+import threading
+import time
+import types
+import bot_logging
+
+
+def make_record(msg, *args, **fields):
+    """Build a record as the bot logger would hand it to its handlers"""
+    return logging.makeLogRecord(dict(fields, name="cryptodip.test", levelno=logging.INFO,
+                                      levelname="INFO", msg=msg, args=args))
+
+
+class BlockedStream:
+    """
+    A log sink that hangs on every write until it is released
+    """
+    def __init__(self):
+        self.released = threading.Event()
+        self.lines = []
+
+    def write(self, text):
+        """Wait for the release, then keep the text"""
+        self.released.wait()
+        self.lines.append(text)
+
+    def flush(self):
+        """Nothing is buffered"""
+
+
+def test_full_queue_drops_and_counts():
+    """Records past the queue size are dropped without waiting and the next one reports them"""
+    log_queue = queue.SimpleQueue()
+    handler = bot_logging.DroppingQueueHandler(log_queue, max_size=2)
+    start = time.monotonic()
+    for number in range(5):
+        handler.handle(make_record("Record %s", number))
+    assert time.monotonic() - start < 1
+    assert log_queue.qsize() == 2
+    assert handler.dropped == 3
+    assert log_queue.get_nowait().msg == "Record 0"
+    handler.handle(make_record("Record %s", 5))
+    assert log_queue.get_nowait().dropped == 0
+    late_record = log_queue.get_nowait()
+    assert (late_record.msg, late_record.dropped) == ("Record 5", 3)
+    assert handler.dropped == 0
+
+
+def test_sampling_burst_and_window(monkeypatch):
+    """Each bot gets a burst of each message per interval and the next one reports the rest"""
+    now = [0.0]
+    monkeypatch.setattr(bot_logging, "time", types.SimpleNamespace(monotonic=lambda: now[0]))
+    sampling = bot_logging.SamplingFilter(burst=2, interval=60)
+    passed = [sampling.filter(make_record("Price source failed", bot="bot")) for _ in range(5)]
+    assert passed == [True, True, False, False, False]
+    assert sampling.filter(make_record("Price source failed", bot="other-bot"))
+    now[0] = 59
+    assert not sampling.filter(make_record("Price source failed", bot="bot"))
+    now[0] = 60
+    record = make_record("Price source failed", bot="bot")
+    assert sampling.filter(record)
+    assert record.suppressed == 4
+    record = make_record("Price source failed", bot="bot")
+    assert sampling.filter(record)
+    assert record.suppressed == 0
+
+
+def test_json_fields():
+    """Context, extra fields, and counts are written as JSON fields and empty ones are left out"""
+    record = make_record("The current price of %s is %s", "ETH", 100.0, bot="bot", cycle=3,
+                         stage="price", latency_ms=1.5, fields={"order_id": "1"}, suppressed=2,
+                         dropped=0)
+    entry = json.loads(bot_logging.JSONFormatter().format(record))
+    del entry['time']
+    assert entry == {"level": "INFO", "logger": "cryptodip.test",
+                     "message": "The current price of ETH is 100.0", "bot": "bot", "cycle": 3,
+                     "stage": "price", "latency_ms": 1.5, "order_id": "1", "suppressed": 2}
+    try:
+        raise ValueError("Bad price")
+    except ValueError:
+        record = make_record("Price source failed", exc_info=sys.exc_info())
+    entry = json.loads(bot_logging.JSONFormatter().format(record))
+    assert "bot" not in entry
+    assert "ValueError: Bad price" in entry['exception']
+
+
+def test_stop_gives_up_on_blocked_stream():
+    """Stopping with a timeout returns even though the sink never finishes a write"""
+    stream = BlockedStream()
+    log_queue = queue.SimpleQueue()
+    listener = bot_logging.LogListener(log_queue, logging.StreamHandler(stream))
+    listener.start()
+    log_queue.put(make_record("Stuck record"))
+    start = time.monotonic()
+    listener.stop(0.2)
+    assert time.monotonic() - start < 2
+    stream.released.set()
+
+
+def test_worker_logs_with_caller_context():
+    """A wrapped function logs with the submitting bot's context and leaves the worker clean"""
+    def get_context():
+        return bot_logging.CONTEXT.bot, bot_logging.CONTEXT.cycle, bot_logging.CONTEXT.stage
+
+    bot_logging.set_context("bot", 3)
+    bot_logging.set_stage("price")
+    try:
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            assert executor.submit(bot_logging.in_context(get_context)).result() == \
+                ("bot", 3, "price")
+            assert executor.submit(get_context).result() == (None, None, None)
+    finally:
+        bot_logging.set_context()
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""Tests for the health and status endpoint"""
+#
+# Python Script:: test_health.py
+#
+# Linter:: pylint
+#
+# Copyright 2021, Matthew Ahrenstein, All Rights Reserved.
+#
+# Maintainers:
+# - Matthew Ahrenstein: matt@ahrenstein.com
+#
+# See LICENSE
+#
+
+import json
+import logging
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+import bot_logging
+import health
+import price_sources
+
+
+@pytest.fixture(name="status")
+def fixture_status(monkeypatch):
+    """An empty status table for the test"""
+    monkeypatch.setattr(health, "STATUS", {})
+    return health.STATUS
+
+
+def test_stopped_bot_is_healthy():
+    """A bot that is not running is never stuck"""
+    assert health.get_bot_health({"running": False}, 10000) == (True, None)
+
+
+def test_long_cycle_is_stuck():
+    """A cycle that runs past the limit is reported"""
+    status = {"running": True, "in_cycle": True, "cycle_started": 0}
+    assert health.get_bot_health(status, health.STUCK_AFTER_SECONDS)[0]
+    healthy, reason = health.get_bot_health(status, health.STUCK_AFTER_SECONDS + 1)
+    assert not healthy
+    assert "cycle has run" in reason
+
+
+def test_overdue_cycle_is_stuck():
+    """A bot that doesn't start its next cycle in time is reported"""
+    status = {"running": True, "in_cycle": False, "cycle_finished": 0, "cycle_time_minutes": 1}
+    assert health.get_bot_health(status, 60 + health.STUCK_AFTER_SECONDS)[0]
+    assert not health.get_bot_health(status, 61 + health.STUCK_AFTER_SECONDS)[0]
+
+
+@pytest.mark.usefixtures("status")
+def test_status_report():
+    """The report carries each bot's fields with ages instead of monotonic times"""
+    health.start_cycle("bot", 3, "2021-04-01", 60)
+    health.update_status("bot", last_price=100.0)
+    health.finish_cycle("bot")
+    report = health.get_status_report()
+    assert report['healthy']
+    bot_status = report['bots']['bot']
+    assert bot_status['cycle'] == 3
+    assert bot_status['last_price'] == 100.0
+    assert not bot_status['in_cycle']
+    assert 'cycle_started' not in bot_status
+    assert 'cycle_finished' not in bot_status
+    assert bot_status['seconds_since_cycle_start'] >= 0
+
+
+def test_worker_error_reaches_bot_status(status, monkeypatch):
+    """An error logged by a price source in the bot's pool is kept as the bot's last error"""
+    monkeypatch.setattr(logging.getLogger(bot_logging.LOGGER_NAME), "handlers",
+                        [health.ErrorStatusHandler()])
+
+    def failing_source():
+        raise ConnectionError("Connection refused")
+
+    bot_logging.set_context("bot", 1)
+    try:
+        with ThreadPoolExecutor(max_workers=1) as price_executor:
+            assert price_sources.get_quorum_price([("source", failing_source)],
+                                                  price_executor) == -1
+    finally:
+        bot_logging.set_context()
+    assert status["bot"]["last_error"] == "Price source failed: Connection refused"
+
+
+def test_health_server(status, monkeypatch):
+    """/health answers 200 while the bots make progress and 503 once one is stuck"""
+    # Keep the error handler the server adds off the bot logger once the test is done
+    monkeypatch.setattr(logging.getLogger(bot_logging.LOGGER_NAME), "handlers", [])
+    server = health.start_health_server(0, "127.0.0.1")
+    url = "http://127.0.0.1:%s" % server.server_address[1]
+    try:
+        health.start_cycle("bot", 1, "2021-04-01", 60)
+        with urllib.request.urlopen(url + "/health", timeout=5) as response:
+            assert json.load(response) == {"healthy": True,
+                                           "bots": {"bot": {"healthy": True, "cycle": 1}}}
+        status["bot"]["cycle_started"] -= health.STUCK_AFTER_SECONDS + 1
+        with pytest.raises(urllib.error.HTTPError) as error:
+            with urllib.request.urlopen(url + "/status", timeout=5):
+                pass
+        with error.value:
+            assert error.value.code == 503
+            assert not json.load(error.value)['bots']['bot']['healthy']
+    finally:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""Tests for picking the dip tier to buy"""
+#
+# Python Script:: test_ladder.py
+#
+# Linter:: pylint
+#
+# Copyright 2021, Matthew Ahrenstein, All Rights Reserved.
+#
+# Maintainers:
+# - Matthew Ahrenstein: matt@ahrenstein.com
+#
+# See LICENSE
+#
+
+import datetime
+import json
+import pytest
+from conftest import START_TIME
+import ladder
+
+# Ordered from the deepest dip to the shallowest, as read_ladder_config returns them
+TIERS = [(30, 300, 21, "dip-30"), (20, 100, 14, "dip-20"), (10, 50, 7, "dip-10")]
+
+
+def days_ago(days):
+    """The time a number of days before START_TIME"""
+    return START_TIME - datetime.timedelta(days=days)
+
+
+def test_read_ladder_config(tmp_path):
+    """Ladder tiers are sorted deepest first and inherit the bot's cool down period"""
+    config_file = tmp_path / "config.json"
+    config_file.write_text(json.dumps({"bot": {
+        "cool_down_period_days": 5,
+        "ladder": [{"dip_percentage": 10, "buy_amount": 50},
+                   {"dip_percentage": 25, "buy_amount": 200, "cool_down_period_days": 14}]}}))
+    assert ladder.read_ladder_config(str(config_file)) == \
+        [(25, 200, 14, "dip-25"), (10, 50, 5, "dip-10")]
+
+
+def test_read_legacy_config(tmp_path):
+    """A bot without a ladder keeps its single buy-date record"""
+    config_file = tmp_path / "config.json"
+    config_file.write_text(json.dumps({"bot": {"dip_percentage": 10, "buy_amount": 50}}))
+    assert ladder.read_ladder_config(str(config_file)) == \
+        [(10, 50, 7, ladder.LEGACY_TIER_ID)]
+
+
+def test_ladder_only_config(tmp_path):
+    """Tier IDs don't depend on how the dip percentage is written"""
+    config_file = tmp_path / "config.json"
+    config_file.write_text(json.dumps({"bot": {"ladder": [
+        {"dip_percentage": 5.0, "buy_amount": 50}, {"dip_percentage": 12.5, "buy_amount": 100}]}}))
+    assert ladder.read_ladder_config(str(config_file)) == \
+        [(12.5, 100, 7, "dip-12.5"), (5.0, 50, 7, "dip-5")]
+
+
+def test_duplicate_dip_percentage(tmp_path):
+    """Two tiers with the same dip would share a cool down, so the ladder is rejected"""
+    config_file = tmp_path / "config.json"
+    config_file.write_text(json.dumps({"bot": {"ladder": [
+        {"dip_percentage": 5, "buy_amount": 50}, {"dip_percentage": 5.0, "buy_amount": 100}]}}))
+    with pytest.raises(ValueError, match="more than one tier"):
+        ladder.read_ladder_config(str(config_file))
+
+
+def test_thresholds_ascend():
+    """Deeper tiers buy at lower prices"""
+    assert ladder.get_thresholds(TIERS, 1000) == [700, 800, 900]
+
+
+def test_clear_tiers():
+    """Each index points at the first tier from there on that is out of its cool down"""
+    buy_dates = {"dip-30": days_ago(30), "dip-20": days_ago(1), "dip-10": days_ago(8)}
+    assert ladder.get_clear_tiers(TIERS, buy_dates, START_TIME) == [0, 2, 2, None]
+
+
+def test_unknown_buy_date_is_not_clear():
+    """A tier whose last buy is unknown never buys"""
+    buy_dates = {"dip-30": days_ago(30), "dip-20": days_ago(30)}
+    assert ladder.get_clear_tiers(TIERS, buy_dates, START_TIME) == [0, 1, None, None]
+
+
+def test_find_deepest_reached_tier():
+    """The deepest reached tier buys when it is clear"""
+    buy_dates = {tier[3]: days_ago(30) for tier in TIERS}
+    next_clear = ladder.get_clear_tiers(TIERS, buy_dates, START_TIME)
+    thresholds = ladder.get_thresholds(TIERS, 1000)
+    assert ladder.find_tier(thresholds, 650, next_clear) == 0
+    assert ladder.find_tier(thresholds, 700, next_clear) == 0
+    assert ladder.find_tier(thresholds, 750, next_clear) == 1
+    assert ladder.find_tier(thresholds, 900, next_clear) == 2
+    assert ladder.find_tier(thresholds, 901, next_clear) is None
+
+
+def test_find_tier_skips_cooling_down_tiers():
+    """A reached tier in its cool down passes the buy to the next shallower clear tier"""
+    buy_dates = {"dip-30": days_ago(1), "dip-20": days_ago(1), "dip-10": days_ago(8)}
+    next_clear = ladder.get_clear_tiers(TIERS, buy_dates, START_TIME)
+    thresholds = ladder.get_thresholds(TIERS, 1000)
+    assert ladder.find_tier(thresholds, 650, next_clear) == 2
+    buy_dates["dip-10"] = days_ago(1)
+    next_clear = ladder.get_clear_tiers(TIERS, buy_dates, START_TIME)
+    assert ladder.find_tier(thresholds, 650, next_clear) is None
+
+
+def test_cool_downs_remaining():
+    """Cool downs count down to zero and are unknown without a buy date"""
+    buy_dates = {"dip-30": days_ago(20), "dip-10": days_ago(8)}
+    assert ladder.get_cool_downs_remaining(TIERS, buy_dates, START_TIME) == \
+        {"dip-30": 86400, "dip-20": None, "dip-10": 0}
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""Tests for the leases that share bots across replicas"""
+#
+# Python Script:: test_leases.py
+#
+# Linter:: pylint
+#
+# Copyright 2021, Matthew Ahrenstein, All Rights Reserved.
+#
+# Maintainers:
+# - Matthew Ahrenstein: matt@ahrenstein.com
+#
+# See LICENSE
+#
+
+import datetime
+import pytest
+from conftest import DB_SERVER
+import leases
+
+
+def expire_lease(database, bot_name):
+    """Make a bot's lease look like its owner stopped renewing it"""
+    database[leases.LEASE_DB]["leases"].update_one(
+        {"_id": bot_name}, {"$set": {"expires": datetime.datetime(1970, 1, 1)}})
+
+
+@pytest.mark.usefixtures("database")
+def test_acquire_free_lease():
+    """The first replica to ask gets the lease and the first fencing token"""
+    lease = leases.BotLease(DB_SERVER, "bot", "node-a")
+    assert lease.acquire()
+    assert lease.token == 1
+    assert lease.is_held()
+
+
+@pytest.mark.usefixtures("database")
+def test_lease_held_by_another_replica():
+    """A replica can't take a lease that another one holds and renews"""
+    assert leases.BotLease(DB_SERVER, "bot", "node-a").acquire()
+    other_lease = leases.BotLease(DB_SERVER, "bot", "node-b")
+    assert not other_lease.acquire()
+    assert not other_lease.is_held()
+
+
+def test_expired_lease_is_taken_over(database):
+    """An expired lease moves to another replica with a higher token and can't be renewed"""
+    lease = leases.BotLease(DB_SERVER, "bot", "node-a")
+    assert lease.acquire()
+    expire_lease(database, "bot")
+    other_lease = leases.BotLease(DB_SERVER, "bot", "node-b")
+    assert other_lease.acquire()
+    assert other_lease.token == 2
+    assert not lease.renew()
+    assert not lease.is_held()
+    assert other_lease.renew()
+
+
+@pytest.mark.usefixtures("database")
+def test_released_lease_is_reclaimed_with_new_token():
+    """A lease object that is claimed again carries the new token"""
+    lease = leases.BotLease(DB_SERVER, "bot", "node-a")
+    assert lease.acquire()
+    lease.release()
+    assert not lease.is_held()
+    assert lease.acquire()
+    assert lease.token == 2
+
+
+def test_leases_share_the_mongo_client(database):
+    """Leases use the shared client instead of opening their own connections"""
+    lease = leases.BotLease(DB_SERVER, "bot", "node-a")
+    assert lease.leases is database[leases.LEASE_DB]["leases"]
+
+
+def test_heartbeat_counts_live_nodes(database):
+    """Expired and removed replicas stop counting towards the fair share"""
+    assert leases.heartbeat_node(DB_SERVER, "node-a") == 1
+    assert leases.heartbeat_node(DB_SERVER, "node-b") == 2
+    database[leases.LEASE_DB]["nodes"].update_one(
+        {"_id": "node-b"}, {"$set": {"expires": datetime.datetime(1970, 1, 1)}})
+    assert leases.heartbeat_node(DB_SERVER, "node-a") == 1
+    leases.remove_node(DB_SERVER, "node-a")
+    assert database[leases.LEASE_DB]["nodes"].count_documents({}) == 0
+
+
+def test_fair_share():
+    """Every bot is covered when the bots don't split evenly"""
+    assert leases.fair_share(5, 2) == 3
+    assert leases.fair_share(4, 2) == 2
+    assert leases.fair_share(1, 3) == 1
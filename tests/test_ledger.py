@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""Tests for the fill ledger and its running totals"""
+#
+# Python Script:: test_ledger.py
+#
+# Linter:: pylint
+#
+# Copyright 2021, Matthew Ahrenstein, All Rights Reserved.
+#
+# Maintainers:
+# - Matthew Ahrenstein: matt@ahrenstein.com
+#
+# See LICENSE
+#
+
+from array import array
+import pytest
+from conftest import DB_SERVER
+import ledger
+import memory_mongo
+import mongo
+import replay
+
+FILL = {"venue": "coinbase", "fill_id": "1", "price": 100.0, "size": 0.5, "fee": 0.25}
+
+
+def get_totals():
+    """Get the bot's ledger totals"""
+    return mongo.get_ledger_totals("bot", DB_SERVER)
+
+
+def get_counting():
+    """Get the fill IDs the totals still hold as being counted"""
+    totals = mongo.get_mongo_client(DB_SERVER)["bot"]["ledger"].find_one({"_id": "totals"})
+    return totals['counting']
+
+
+def lose_connection(*args):
+    """Fail like a database write on a dropped connection"""
+    del args
+    raise ConnectionError("Connection lost")
+
+
+def fail_counted_flag(monkeypatch):
+    """Make marking a fill as counted fail, as if the bot died right after the $inc"""
+    update_one = memory_mongo.Collection.update_one
+
+    def failing_update_one(self, query, update, upsert=False):
+        if update == {"$set": {"counted": True}}:
+            lose_connection()
+        return update_one(self, query, update, upsert)
+
+    monkeypatch.setattr(memory_mongo.Collection, "update_one", failing_update_one)
+
+
+@pytest.mark.usefixtures("database")
+def test_fill_is_counted_once():
+    """Recording the same fill again leaves the totals alone"""
+    assert mongo.record_fill("bot", DB_SERVER, FILL)
+    assert not mongo.record_fill("bot", DB_SERVER, FILL)
+    assert get_totals() == {"invested": 50.25, "size": 0.5, "fees": 0.25, "fills": 1}
+
+
+@pytest.mark.usefixtures("database")
+def test_uncounted_fill_is_reconciled(monkeypatch):
+    """A fill recorded without reaching the totals is counted by the next reconcile"""
+    with monkeypatch.context() as patch:
+        patch.setattr(mongo, "count_fill", lose_connection)
+        assert not mongo.record_fill("bot", DB_SERVER, FILL)
+    assert get_totals()['fills'] == 0
+    assert mongo.reconcile_fills("bot", DB_SERVER) == 1
+    assert mongo.reconcile_fills("bot", DB_SERVER) == 0
+    assert get_totals() == {"invested": 50.25, "size": 0.5, "fees": 0.25, "fills": 1}
+
+
+@pytest.mark.usefixtures("database")
+def test_counted_fill_is_not_counted_twice(monkeypatch):
+    """A fill that reached the totals but was never marked counted is not added again"""
+    with monkeypatch.context() as patch:
+        fail_counted_flag(patch)
+        assert not mongo.record_fill("bot", DB_SERVER, FILL)
+    assert mongo.reconcile_fills("bot", DB_SERVER) == 1
+    assert not mongo.record_fill("bot", DB_SERVER, FILL)
+    assert get_totals() == {"invested": 50.25, "size": 0.5, "fees": 0.25, "fills": 1}
+
+
+@pytest.mark.usefixtures("database")
+def test_later_fill_does_not_uncount_earlier_one(monkeypatch):
+    """A fill left unmarked is not counted again after a later fill of the order is recorded"""
+    second_fill = dict(FILL, fill_id="2")
+    with monkeypatch.context() as patch:
+        fail_counted_flag(patch)
+        assert not mongo.record_fill("bot", DB_SERVER, FILL)
+    assert mongo.record_fill("bot", DB_SERVER, second_fill)
+    assert mongo.reconcile_fills("bot", DB_SERVER) == 1
+    assert get_totals() == {"invested": 100.5, "size": 1.0, "fees": 0.5, "fills": 2}
+    assert not get_counting()
+
+
+@pytest.mark.usefixtures("virtual_clock")
+def test_record_buy(database):
+    """Each order and its fills are recorded, and a failed order has no fills"""
+    harness = replay.ReplayHarness(array('q', [0]), array('d', [2000.0]), 1000)
+    venue = harness.build_venue("coinbase", None, False, 0.5)
+    order_id = venue.place_buy_order("ETH", 100)
+    assert ledger.record_buy("bot", DB_SERVER, venue, "ETH", 100, order_id) == 1
+    assert ledger.record_buy("bot", DB_SERVER, venue, "ETH", 100, None) == 0
+    assert database["bot"]["orders"].count_documents({}) == 2
+    totals = get_totals()
+    assert totals['fills'] == 1
+    assert totals['invested'] == pytest.approx(100)
+    assert totals['fees'] == pytest.approx(0.5)
+    assert totals['size'] == pytest.approx(99.5 / 2000)
+
+
+def test_build_report():
+    """The cost basis and P&L come from the totals"""
+    report = ledger.build_report({"invested": 100.0, "size": 0.5, "fees": 1.0, "fills": 2}, 250)
+    assert report['average_cost'] == 200
+    assert report['value'] == 125
+    assert report['unrealized_pnl'] == 25
+    report = ledger.build_report({"invested": 0, "size": 0, "fees": 0, "fills": 0}, None)
+    assert report['average_cost'] is None
+    assert report['unrealized_pnl'] is None
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""Tests for the buy date reservations in MongoDB"""
+#
+# Python Script:: test_mongo.py
+#
+# Linter:: pylint
+#
+# Copyright 2021, Matthew Ahrenstein, All Rights Reserved.
+#
+# Maintainers:
+# - Matthew Ahrenstein: matt@ahrenstein.com
+#
+# See LICENSE
+#
+
+import datetime
+import pytest
+from conftest import DB_SERVER, START_TIME
+import mongo
+
+
+def add_buy_date(database, days_ago, fence=None):
+    """Create the bot's buy-date record as a replicated or standalone run left it"""
+    record = {"_id": 1, "time": START_TIME - datetime.timedelta(days=days_ago)}
+    if fence is not None:
+        record["fence"] = fence
+    database["bot"]["buy-date"].insert_one(record)
+
+
+@pytest.mark.usefixtures("virtual_clock")
+def test_reserve_outside_cool_down(database):
+    """A buy is reserved once the cool down has passed and the fence is raised to the token"""
+    add_buy_date(database, 8, fence=2)
+    assert mongo.reserve_buy_date("bot", DB_SERVER, 7, 3) == START_TIME
+    assert database["bot"]["buy-date"].find_one({"_id": 1}) == \
+        {"_id": 1, "time": START_TIME, "fence": 3}
+
+
+@pytest.mark.usefixtures("virtual_clock")
+def test_reserve_inside_cool_down(database):
+    """A second buy inside the cool down is refused"""
+    add_buy_date(database, 6)
+    assert mongo.reserve_buy_date("bot", DB_SERVER, 7, 1) is None
+
+
+@pytest.mark.usefixtures("virtual_clock")
+def test_reserve_with_stale_token(database):
+    """A replica whose lease was taken over can't buy even outside the cool down"""
+    add_buy_date(database, 8, fence=3)
+    assert mongo.reserve_buy_date("bot", DB_SERVER, 7, 2) is None
+    assert database["bot"]["buy-date"].find_one({"_id": 1})['fence'] == 3
+
+
+@pytest.mark.usefixtures("virtual_clock")
+def test_reserve_standalone_after_replicated_run(database):
+    """A standalone bot ignores the fence a replicated run left and keeps it"""
+    add_buy_date(database, 8, fence=3)
+    assert mongo.reserve_buy_date("bot", DB_SERVER, 7, None) == START_TIME
+    assert database["bot"]["buy-date"].find_one({"_id": 1})['fence'] == 3
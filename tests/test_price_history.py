@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""Tests for exporting and importing price history files"""
+#
+# Python Script:: test_price_history.py
+#
+# Linter:: pylint
+#
+# Copyright 2021, Matthew Ahrenstein, All Rights Reserved.
+#
+# Maintainers:
+# - Matthew Ahrenstein: matt@ahrenstein.com
+#
+# See LICENSE
+#
+
+import datetime
+import os
+import pytest
+from conftest import DB_SERVER, START_TIME
+import price_history
+
+PRICES = [(START_TIME + datetime.timedelta(hours=hour), 100.0 + hour) for hour in range(25)]
+
+
+@pytest.fixture(name="exported")
+def fixture_exported(database, tmp_path, monkeypatch):
+    """A price file exported in blocks of 10 records from a bot's history
+
+    Returns:
+    export_path: The path of the price file
+    """
+    monkeypatch.setattr(price_history, "EXPORT_BATCH_SIZE", 10)
+    database["bot"]["prices"].insert_many([{"time": record[0], "price": record[1]}
+                                           for record in PRICES])
+    export_path = str(tmp_path / "prices.cdbp")
+    assert price_history.export_prices("bot", DB_SERVER, export_path) == len(PRICES)
+    return export_path
+
+
+def get_prices(database, bot_name):
+    """Get a bot's price history ordered oldest first"""
+    return [(record['time'], record['price'])
+            for record in database[bot_name]["prices"].find().sort("time", 1)]
+
+
+def corrupt(export_path, offset, data):
+    """Overwrite part of a price file"""
+    with open(export_path, "r+b") as export_file:
+        export_file.seek(offset)
+        export_file.write(data)
+
+
+def test_round_trip(exported, database):
+    """An export imports into another bot exactly as it was"""
+    assert price_history.import_prices("other-bot", DB_SERVER, exported) == len(PRICES)
+    assert get_prices(database, "other-bot") == PRICES
+    assert [len(batch) for batch in price_history.read_price_blocks(exported)] == [10, 10, 5]
+
+
+def test_import_twice(exported, database):
+    """Importing a file again inserts nothing"""
+    assert price_history.import_prices("other-bot", DB_SERVER, exported) == len(PRICES)
+    assert price_history.import_prices("other-bot", DB_SERVER, exported) == 0
+    assert price_history.import_prices("bot", DB_SERVER, exported) == 0
+    assert get_prices(database, "other-bot") == PRICES
+
+
+def test_truncated_file(exported, database):
+    """A file cut off in its last block imports nothing"""
+    os.truncate(exported, os.path.getsize(exported) - 8)
+    with pytest.raises(ValueError, match="truncated"):
+        price_history.import_prices("other-bot", DB_SERVER, exported)
+    assert not get_prices(database, "other-bot")
+
+
+def test_corrupt_block(exported, database):
+    """A corrupt block after good ones imports nothing"""
+    corrupt(exported, os.path.getsize(exported) - 8, b"\xff" * 8)
+    with pytest.raises(ValueError, match="corrupt"):
+        price_history.import_prices("other-bot", DB_SERVER, exported)
+    assert not get_prices(database, "other-bot")
+
+
+@pytest.mark.usefixtures("database")
+def test_empty_file(tmp_path):
+    """An empty file is reported as not being a price file"""
+    empty_path = tmp_path / "empty.cdbp"
+    empty_path.write_bytes(b"")
+    with pytest.raises(ValueError, match="not a price history file"):
+        price_history.import_prices("bot", DB_SERVER, str(empty_path))
+
+
+def test_wrong_format(exported):
+    """A file from another program is rejected"""
+    corrupt(exported, 0, b"XXXX")
+    with pytest.raises(ValueError, match="not a price history file"):
+        price_history.verify_price_file(exported)
+
+
+@pytest.mark.usefixtures("database")
+def test_export_without_prices(tmp_path):
+    """A bot without history exports a file with no blocks"""
+    export_path = str(tmp_path / "prices.cdbp")
+    assert price_history.export_prices("bot", DB_SERVER, export_path) == 0
+    assert price_history.verify_price_file(export_path) == 0
+    assert not list(price_history.read_price_blocks(export_path))
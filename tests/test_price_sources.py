@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""Tests for agreeing on a price across several sources"""
+#
+# Python Script:: test_price_sources.py
+#
+# Linter:: pylint
+#
+# Copyright 2021, Matthew Ahrenstein, All Rights Reserved.
+#
+# Maintainers:
+# - Matthew Ahrenstein: matt@ahrenstein.com
+#
+# See LICENSE
+#
+
+import threading
+import time
+import pytest
+import price_sources
+
+
+@pytest.fixture(name="executor")
+def fixture_executor():
+    """A pool for four sources, shut down without waiting on hung ones"""
+    executor = price_sources.build_price_executor([("source", None)] * 4, "bot")
+    yield executor
+    executor.shutdown(wait=False)
+
+
+@pytest.fixture(name="release")
+def fixture_release():
+    """An event that hung sources wait on, set afterwards so they free their workers"""
+    release = threading.Event()
+    yield release
+    release.set()
+
+
+def fixed_price(price):
+    """A source that always answers with the same price"""
+    return lambda: price
+
+
+def failing_source():
+    """A source whose API call fails"""
+    raise ValueError("API error")
+
+
+def test_median_of_agreeing_sources(executor):
+    """The median is used once the quorum has answered"""
+    sources = [("a", fixed_price(100)), ("b", fixed_price(101)), ("c", fixed_price(99))]
+    assert price_sources.get_quorum_price(sources, executor, quorum=3) == 100
+
+
+def test_outlier_is_rejected(executor):
+    """A price too far from the median is left out"""
+    sources = [("a", fixed_price(100)), ("b", fixed_price(101)), ("c", fixed_price(150))]
+    assert price_sources.get_quorum_price(sources, executor, quorum=3,
+                                          max_deviation_percent=2) == 100.5
+
+
+def test_failing_and_invalid_sources_are_ignored(executor):
+    """Errors and prices that are not positive never count towards the quorum"""
+    sources = [("a", failing_source), ("b", fixed_price(-1)), ("c", fixed_price(float("nan"))),
+               ("d", fixed_price(100))]
+    assert price_sources.get_quorum_price(sources, executor, quorum=2, deadline_seconds=0.5) == 100
+
+
+def test_no_valid_price(executor):
+    """The cycle is told to give up when no source answers"""
+    assert price_sources.get_quorum_price([("a", failing_source)], executor) == -1
+
+
+def test_slow_source_is_hedged(release):
+    """A duplicate request answers for a source whose first request hung,
+    even when the bot has only the one source"""
+    calls = []
+
+    def slow_first_call():
+        calls.append(time.monotonic())
+        if len(calls) == 1:
+            release.wait()
+        return 100
+
+    sources = [("a", slow_first_call)]
+    executor = price_sources.build_price_executor(sources, "bot")
+    started = time.monotonic()
+    price = price_sources.get_quorum_price(sources, executor, hedge_after_seconds=0.05,
+                                           deadline_seconds=5)
+    executor.shutdown(wait=False)
+    assert price == 100
+    assert len(calls) == 2
+    assert time.monotonic() - started < 1
+
+
+def test_deadline_without_quorum(executor, release):
+    """The answers that arrived by the deadline are used when the quorum is not reached"""
+    def hung_source():
+        release.wait()
+        return 200
+
+    started = time.monotonic()
+    price = price_sources.get_quorum_price([("a", fixed_price(100)), ("b", hung_source)],
+                                           executor, quorum=2, hedge_after_seconds=0.05,
+                                           deadline_seconds=0.2)
+    assert price == 100
+    assert time.monotonic() - started < 1
+
+
+def test_hung_requests_of_another_bot(executor, release):
+    """A bot's price is not held up by another bot whose requests all hung"""
+    other_executor = price_sources.build_price_executor([("a", None)], "other-bot")
+    for _ in range(10):
+        other_executor.submit(release.wait)
+    assert price_sources.get_quorum_price([("a", fixed_price(100))], executor,
+                                          deadline_seconds=1) == 100
+    other_executor.shutdown(wait=False)
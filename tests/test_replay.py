@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""Tests that run the real bot cycle over a price tape"""
+#
+# Python Script:: test_replay.py
+#
+# Linter:: pylint
+#
+# Copyright 2021, Matthew Ahrenstein, All Rights Reserved.
+#
+# Maintainers:
+# - Matthew Ahrenstein: matt@ahrenstein.com
+#
+# See LICENSE
+#
+
+from array import array
+import datetime
+import json
+import pytest
+from conftest import START_TIME
+import bot_internals
+import clock
+import health
+import memory_mongo
+import mongo
+import replay
+import snapshot
+
+BOT_CONFIG = {"bot": {"currency": "ETH", "cycle_time_minutes": 60, "name": "replay-bot",
+                      "ladder": [{"dip_percentage": 10, "buy_amount": 50},
+                                 {"dip_percentage": 25, "buy_amount": 200,
+                                  "cool_down_period_days": 14}]},
+              "coinbase": {}}
+
+
+def run_bot(tmp_path, monkeypatch, tape, usd_balance):
+    """Run the bot over an hourly tape of prices starting at START_TIME
+
+    Returns:
+    buys: The buys the stand-in exchange filled as (time, buy amount) tuples
+    database: The in-memory database the bot used
+    """
+    config_file = tmp_path / "config.json"
+    config_file.write_text(json.dumps(BOT_CONFIG))
+    tape_times = array('q', [snapshot.datetime_to_micros(START_TIME +
+                                                        datetime.timedelta(hours=hour))
+                             for hour in range(len(tape))])
+    harness = replay.ReplayHarness(tape_times, array('d', tape), usd_balance)
+    database = memory_mongo.MongoClient()
+    monkeypatch.setitem(mongo.MONGO_CLIENTS, bot_internals.MONGO_DB_CONNECTION, database)
+    previous_clock = clock.use_clock(clock.VirtualClock(
+        START_TIME, snapshot.micros_to_datetime(tape_times[-1])))
+    try:
+        with pytest.raises(clock.ClockStopped):
+            bot_internals.bot_cycle(str(config_file), False, "coinbase", replay=harness)
+    finally:
+        clock.use_clock(previous_clock)
+    return [(buy[0], buy[4]) for buy in harness.buys], database
+
+
+def dip_tape():
+    """Fifteen days at $100 so every tier is out of its cool down, then two days at $70"""
+    return [100.0] * 15 * 24 + [70.0] * 2 * 24
+
+
+def test_deepest_tier_buys_then_next_tier(tmp_path, monkeypatch):
+    """The deepest reached tier buys first and the shallower tier buys on the next cycle"""
+    buys, database = run_bot(tmp_path, monkeypatch, dip_tape(), 10000)
+    dip_start = START_TIME + datetime.timedelta(days=15)
+    assert buys == [(dip_start, 200), (dip_start + datetime.timedelta(hours=1), 50)]
+    totals = mongo.get_ledger_totals("replay-bot", bot_internals.MONGO_DB_CONNECTION)
+    assert totals['fills'] == 2
+    assert database["replay-bot"]["buy-date"].find_one({"_id": "dip-25"})['time'] == dip_start
+
+
+def test_unaffordable_tier_falls_back(tmp_path, monkeypatch):
+    """A reached tier the account can't pay for passes the buy to a shallower tier"""
+    buys, _ = run_bot(tmp_path, monkeypatch, dip_tape(), 120)
+    assert buys == [(START_TIME + datetime.timedelta(days=15), 50)]
+
+
+def test_no_dip_no_buys(tmp_path, monkeypatch):
+    """A flat price never buys"""
+    buys, database = run_bot(tmp_path, monkeypatch, [100.0] * 20 * 24, 10000)
+    assert not buys
+    assert database["replay-bot"]["orders"].count_documents({}) == 0
+
+
+def test_thresholds_published_during_cool_down(tmp_path, monkeypatch):
+    """A new bot reports its dip thresholds while every tier is still cooling down"""
+    monkeypatch.setattr(health, "STATUS", {})
+    buys, _ = run_bot(tmp_path, monkeypatch, [100.0] * 24, 10000)
+    assert not buys
+    assert health.STATUS["replay-bot"]["baseline"] == 100
+    assert health.STATUS["replay-bot"]["dip_thresholds"] == {"dip-25": 75, "dip-10": 90}
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""Tests for routing dip buys to the best exchange"""
+#
+# Python Script:: test_routing.py
+#
+# Linter:: pylint
+#
+# Copyright 2021, Matthew Ahrenstein, All Rights Reserved.
+#
+# Maintainers:
+# - Matthew Ahrenstein: matt@ahrenstein.com
+#
+# See LICENSE
+#
+
+from array import array
+import json
+import threading
+import time
+import pytest
+import coinbase_pro
+import gemini_exchange
+import price_sources
+import replay
+import routing
+
+
+@pytest.fixture(name="venues")
+def fixture_venues():
+    """Coinbase Pro and Gemini stand-ins quoting the same price with different fees"""
+    harness = replay.ReplayHarness(array('q', [0]), array('d', [2000.0]), 1000)
+    return [harness.build_venue("coinbase", None, False, 0.5),
+            harness.build_venue("gemini", None, False, 0.35)]
+
+
+@pytest.fixture(name="executor")
+def fixture_executor(venues):
+    """The bots' pool for quoting the venues, shut down without waiting on hung ones"""
+    executor = routing.build_quote_executor(venues, "bot")
+    yield executor
+    executor.shutdown(wait=False)
+
+
+class HungVenue(replay.ReplayVenue):  # pylint: disable=too-few-public-methods
+    """
+    A venue whose balance check never answers until it is released
+    """
+    def __init__(self, harness, release):
+        super().__init__("gemini", "Gemini", 0.35, harness)
+        self.release = release
+
+    def verify_balance(self, buy_amount: float) -> bool:
+        """Wait until released, then check the balance"""
+        self.release.wait()
+        return super().verify_balance(buy_amount)
+
+
+class FakeResponse:  # pylint: disable=too-few-public-methods
+    """
+    A requests response carrying a fixed JSON body
+    """
+    def __init__(self, body):
+        self.body = body
+
+    def json(self):
+        """Get the JSON body"""
+        return self.body
+
+
+def test_coin_received():
+    """The fee comes out of the USD spent"""
+    assert routing.coin_received(100, 2000, 0.5) == pytest.approx(99.5 / 2000)
+
+
+@pytest.mark.usefixtures("virtual_clock")
+def test_cheapest_venue_wins(venues, executor):
+    """The venue that gets the most coin after fees is picked"""
+    assert routing.select_venue(venues, "ETH", 100, 2, executor).name == "gemini"
+
+
+@pytest.mark.usefixtures("virtual_clock")
+def test_unfunded_venue_is_skipped(venues, executor):
+    """A venue without the balance for the buy is never picked"""
+    venues[1].usd_balance = 50
+    assert routing.select_venue(venues, "ETH", 100, 2, executor).name == "coinbase"
+    venues[0].usd_balance = 50
+    assert routing.select_venue(venues, "ETH", 100, 2, executor) is None
+
+
+def test_single_venue_checks_balance(venues, executor):
+    """A bot without routing still checks the balance of its only exchange"""
+    assert routing.select_venue(venues[:1], "ETH", 100, 2, executor) is venues[0]
+    venues[0].usd_balance = 50
+    assert routing.select_venue(venues[:1], "ETH", 100, 2, executor) is None
+
+
+@pytest.mark.usefixtures("virtual_clock")
+def test_venue_missing_the_deadline(venues, executor):
+    """A venue that doesn't quote in time is skipped and the buy isn't held up by it"""
+    release = threading.Event()
+    venues[1] = HungVenue(venues[0].harness, release)
+    started = time.monotonic()
+    try:
+        assert routing.select_venue(venues, "ETH", 100, 0.2, executor) is venues[0]
+    finally:
+        release.set()
+    assert time.monotonic() - started < 1
+
+
+def test_balance_checks_time_out(tmp_path, monkeypatch):
+    """Balance checks are never left waiting on an exchange forever"""
+    config_file = tmp_path / "config.json"
+    config_file.write_text(json.dumps({
+        "coinbase": {"api_key": "key", "api_secret": "c2VjcmV0", "passphrase": "pass"},
+        "gemini": {"api_key": "key", "api_secret": "secret"}}))
+    timeouts = []
+
+    def fake_request(url, **kwargs):
+        del url
+        timeouts.append(kwargs.get('timeout'))
+        return FakeResponse([{"currency": "USD", "balance": "500", "amount": "500"}])
+
+    monkeypatch.setattr(coinbase_pro.requests, "get", fake_request)
+    monkeypatch.setattr(gemini_exchange.requests, "post", fake_request)
+    for name in ("coinbase", "gemini"):
+        venue = routing.build_venue(name, str(config_file), True)
+        assert venue.verify_balance(100)
+    assert timeouts == [price_sources.REQUEST_TIMEOUT_SECONDS] * 2
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""Tests for saving and restoring a bot's warm state"""
+#
+# Python Script:: test_snapshot.py
+#
+# Linter:: pylint
+#
+# Copyright 2021, Matthew Ahrenstein, All Rights Reserved.
+#
+# Maintainers:
+# - Matthew Ahrenstein: matt@ahrenstein.com
+#
+# See LICENSE
+#
+
+import datetime
+import os
+import pytest
+from conftest import DB_SERVER
+import bot_internals
+import snapshot
+
+
+@pytest.fixture(name="saved")
+def fixture_saved(tmp_path):
+    """A snapshot of an hour of prices and a buy date saved just now
+
+    Returns:
+    snapshot_path: The path of the snapshot file
+    price_window: The saved prices
+    buy_dates: The saved buy dates
+    """
+    now = datetime.datetime.utcnow().replace(microsecond=0)
+    price_window = [(now - datetime.timedelta(minutes=60 - minute), 100.0 + minute)
+                    for minute in range(60)]
+    buy_dates = {"dip-10": now - datetime.timedelta(days=3)}
+    snapshot_path = str(tmp_path / "bot.snapshot")
+    snapshot.save_snapshot(snapshot_path, "bot", price_window, buy_dates)
+    return snapshot_path, price_window, buy_dates
+
+
+def corrupt(snapshot_path, offset, data):
+    """Overwrite part of a snapshot file"""
+    with open(snapshot_path, "r+b") as snapshot_file:
+        snapshot_file.seek(offset)
+        snapshot_file.write(data)
+
+
+def test_round_trip(saved):
+    """A fresh snapshot restores exactly what was saved"""
+    snapshot_path, price_window, buy_dates = saved
+    assert snapshot.load_snapshot(snapshot_path, "bot") == (price_window, buy_dates)
+
+
+def test_missing_snapshot(tmp_path):
+    """A missing snapshot is not an error"""
+    assert snapshot.load_snapshot(str(tmp_path / "missing"), "bot") == (None, None)
+
+
+def test_other_bot(saved):
+    """A snapshot is only restored by the bot that saved it"""
+    assert snapshot.load_snapshot(saved[0], "other-bot") == (None, None)
+
+
+def test_corrupt_snapshot(saved):
+    """A flipped byte fails the checksum"""
+    corrupt(saved[0], os.path.getsize(saved[0]) - 20, b"\xff")
+    assert snapshot.load_snapshot(saved[0], "bot") == (None, None)
+
+
+def test_truncated_snapshot(saved):
+    """A torn file is rejected"""
+    os.truncate(saved[0], os.path.getsize(saved[0]) - 8)
+    assert snapshot.load_snapshot(saved[0], "bot") == (None, None)
+    os.truncate(saved[0], 4)
+    assert snapshot.load_snapshot(saved[0], "bot") == (None, None)
+
+
+def test_unknown_format(saved):
+    """A file from another program or version is rejected"""
+    corrupt(saved[0], 0, b"XXXX")
+    assert snapshot.load_snapshot(saved[0], "bot") == (None, None)
+
+
+def test_old_snapshot(saved, monkeypatch):
+    """A snapshot older than the maximum age is missing too much history to use"""
+    monkeypatch.setattr(snapshot, "SNAPSHOT_MAX_AGE_SECONDS", -1)
+    assert snapshot.load_snapshot(saved[0], "bot") == (None, None)
+
+
+def test_snapshot_older_than_price_history(saved):
+    """Prices written after the snapshot was saved make it stale"""
+    newer_price_time = datetime.datetime.utcnow() + datetime.timedelta(seconds=1)
+    assert snapshot.load_snapshot(saved[0], "bot", newer_price_time) == (None, None)
+    older_price_time = saved[1][-1][0]
+    assert snapshot.load_snapshot(saved[0], "bot", older_price_time)[0] == saved[1]
+
+
+def test_restore_uses_snapshot_once(saved, database):
+    """The snapshot is restored instead of the database and removed so it is never reused"""
+    snapshot_path, price_window, buy_dates = saved
+    database["bot"]["prices"].insert_many([{"time": record[0], "price": record[1]}
+                                           for record in price_window[:-1]])
+    restored_window, restored_dates = bot_internals.restore_warm_state(
+        snapshot_path, "bot", DB_SERVER, 3, ["dip-10"])
+    assert list(restored_window) == price_window
+    assert restored_dates == buy_dates
+    assert not os.path.exists(snapshot_path)
+
+
+def test_restore_falls_back_to_database(saved, database):
+    """A snapshot that missed prices recorded since it was saved is ignored"""
+    snapshot_path = saved[0]
+    newer_price = (datetime.datetime.utcnow() + datetime.timedelta(seconds=1), 50.0)
+    database["bot"]["prices"].insert_one({"time": newer_price[0], "price": newer_price[1]})
+    restored_window, restored_dates = bot_internals.restore_warm_state(
+        snapshot_path, "bot", DB_SERVER, 3, ["dip-10"])
+    assert list(restored_window) == [newer_price]
+    assert list(restored_dates) == ["dip-10"]
+    assert os.path.exists(snapshot_path)